@@ -20,12 +20,19 @@ from voice_assistant.tasks.image_understand_task import ImageUnderstandTask
 
 
 # nul parser
-from voice_assistant.nlu.nlu import CommandParser
+from voice_assistant.nlu.nlu import (
+    CommandParser, date_text, time_text,
+    NO_REMINDERS, REMINDER_NOT_FOUND, reminder_added_text, reminder_item_text, reminder_removed_text,
+)
 
 
 from voice_assistant.recognize_speech import recognize_speech
 from voice_assistant.web_server.send_socketinfo import WebSocketClient
 
+# “现在几点/今天几号”的回答排队太久就不再播报（秒）
+TIME_TTL_S = 60
+DATE_TTL_S = 600
+
 class AssistantController:
     def __init__(self, config_path: str, mp3_dir: Path):
         # ——— 读取配置 ———
@@ -121,7 +128,7 @@ class AssistantController:
         if intent == "play_music":
             # 在 asyncio 调度器中创建任务
             # 安全地把 MusicTask 加入主线程的 asyncio 调度器
-            self.scheduler.enqueue( PlayMusicTask())
+            self.scheduler.enqueue( PlayMusicTask(query=params.get("query")))
             self.ws.send_status_update('info', f"开始播放")
         elif intent == "pause_music":
             # 在主循环里创建一个 pause() 的协程任务
@@ -164,7 +171,7 @@ class AssistantController:
             when = params['when']
             at_time = params['when'].strftime("%H:%M")
             txt = params['text']
-            msg = f"已为您设置提醒：{when.hour}点，{when.minute}分，{txt}"
+            msg = reminder_added_text(when, txt)
             self.ws.send_status_update('info', msg)
             self.rem_mgr.add(at_time, f"提醒：{when.hour}点，{when.minute}分，{txt}")
 
@@ -172,16 +179,16 @@ class AssistantController:
         elif intent == "remove_reminder":
             idx = params['idx']
             ok = self.rem_mgr.remove(idx)
-            msg = ok and f"已删除第{idx}条提醒" or "未找到提醒"
+            msg = ok and reminder_removed_text(idx) or REMINDER_NOT_FOUND
 
             self.ws.send_status_update('info', msg)
             self.scheduler.enqueue(SpeakTextTask(msg))
         elif intent == "list_reminders":
             lst = self.rem_mgr.list()
             if not lst:
-                self.scheduler.enqueue( SpeakTextTask("当前没有待提醒事项"))
+                self.scheduler.enqueue( SpeakTextTask(NO_REMINDERS))
             for i, rm in enumerate(lst, 1):
-                reminder_txt = f"第{i}条， {rm.at_time}, {rm.message}"
+                reminder_txt = reminder_item_text(i, rm.at_time, rm.message)
                 self.ws.send_status_update('info', reminder_txt)
                 self.scheduler.enqueue( SpeakTextTask(reminder_txt))
         elif intent == "weather":
@@ -194,14 +201,16 @@ class AssistantController:
             self.ws.send_status_update('info', "正在播报天气")
         elif intent == "get_date":
             # 将 WeatherTask 加入调度器
+            # 播报时再取日期；排队超过 DATE_TTL_S 的回答直接丢弃
             self.scheduler.enqueue(
-                SpeakTextTask(params['date_text'])
+                SpeakTextTask(date_text, ttl_s=DATE_TTL_S)
             )
             self.ws.send_status_update('info', f"当前日期：{params['date_text']}")
         elif intent == "get_time":
             # 将 WeatherTask 加入调度器
+            # 播报时再取时间；排队超过 TIME_TTL_S 的回答已无意义，直接丢弃
             self.scheduler.enqueue(
-                SpeakTextTask(params['time_text'])
+                SpeakTextTask(time_text, deadline_s=0, ttl_s=TIME_TTL_S)
             )
             self.ws.send_status_update('info', f"当前时间：{params['time_text']}")
         elif intent == "image_understand":
@@ -5,6 +5,46 @@ from datetime import datetime
 from typing import Tuple, Dict, Any, Optional
 from datetime import timedelta
 
+WEEKDAYS = ["一", "二", "三", "四", "五", "六", "日"]
+
+
+def date_text(now: Optional[datetime] = None) -> str:
+    """“今天是2025年7月18日，星期五。”"""
+    now = now or datetime.now()
+    return (
+        f"今天是{now.year}年{now.month}月{now.day}日，"
+        f"星期{WEEKDAYS[now.weekday()]}。"
+    )
+
+
+def time_text(now: Optional[datetime] = None) -> str:
+    """“现在是14点5分。”"""
+    now = now or datetime.now()
+    return f"现在是{now.hour}点{now.minute}分。"
+
+
+# 提醒相关的固定回复 / 模板（控制器与 phrase_bank 共用，保证预合成的文字一致）
+NO_REMINDERS = "当前没有待提醒事项"
+REMINDER_NOT_FOUND = "未找到提醒"
+
+
+def reminder_removed_text(idx: int) -> str:
+    return f"已删除第{idx}条提醒"
+
+
+def reminder_item_text(i: int, at_time: str, message: str) -> str:
+    return f"第{i}条， {at_time}, {message}"
+
+
+def reminder_added_text(when: datetime, text: str) -> str:
+    return f"已为您设置提醒：{when.hour}点，{when.minute}分，{text}"
+
+
+def reminder_fire_text(message: str, now: datetime) -> str:
+    """提醒到点时的播报"""
+    return f"现在是{now.strftime('%H点%M分')}，提醒您：{message}"
+
+
 class CommandParser:
     """
     基于关键词和正则的简单NLU，将文本映射为 (intent, params)。
@@ -74,19 +114,9 @@ class CommandParser:
                         direction = 1 if intent == "volume_up" else -1
                         return "set_volume", {"delta_db": direction * num}
                     if intent == "get_date":
-                        now = datetime.now()
-                        weekday_map = ["一", "二", "三", "四", "五", "六", "日"]
-                        text = (
-                            f"今天是{now.year}年{now.month}月{now.day}日，"
-                            f"星期{weekday_map[now.weekday()]}。"
-                        )
-                        return "get_date", {"date_text": text}
+                        return "get_date", {"date_text": date_text()}
                     if intent == "get_time":
-                        now = datetime.now()
-                        hour = now.hour
-                        minute = now.minute
-                        time_text = f"现在是{hour}点{minute}分。"
-                        return "get_time", {"time_text": time_text}
+                        return "get_time", {"time_text": time_text()}
                     if intent == "add_reminder":
                         raw = m.group("raw")
                         when, text = self._parse_datetime_and_text(raw)
@@ -103,6 +133,10 @@ class CommandParser:
 
                     if intent == "list_reminders":
                         return "list_reminders", {}
+                    if intent == "play_music":
+                        # “播放 education” -> 点播关键词 education
+                        query = re.sub(r"^.*?(播放(音乐)?|\bplay\b)", "", txt).strip(" ，。！？,.!?")
+                        return "play_music", {"query": query} if query else {}
                     return intent, {}
 
         if len(text) > 10 and not re.search(r"(音乐|天气|播放|暂停)", text):
@@ -0,0 +1,57 @@
+# gain.py
+import numpy as np
+from pydub.utils import db_to_float
+
+from voice_assistant.player.pcm_cache import SAMPLE_RATE, CHANNELS
+
+# 音量变化的渐变时长，避免增益突变产生“咔哒”声
+RAMP_MS = 20
+
+
+def _linear(gain_db: float) -> float:
+    # 按 float32 取整：渐变末尾的 gains[-1] 是 float32，目标值精度一致才能判等并结束渐变
+    return float(np.float32(db_to_float(gain_db)))
+
+
+class GainStage:
+    """
+    实时增益：对输出 block 做向量化乘法（int16 PCM）。
+    set_db() 只改目标值，之后的 block 在 RAMP_MS 内线性过渡到新增益。
+    """
+    def __init__(self, gain_db: float = 0.0, ramp_ms: int = RAMP_MS):
+        self.ramp_frames = max(1, SAMPLE_RATE * ramp_ms // 1000)
+        self._gain_db = gain_db
+        self._current = _linear(gain_db)
+        # (目标线性增益, 每帧步长) 作为一个整体赋值，回调线程读到的总是一致的一对
+        self._ramp = (self._current, 0.0)
+
+    @property
+    def gain_db(self) -> float:
+        return self._gain_db
+
+    def set_db(self, gain_db: float):
+        self._gain_db = gain_db
+        target = _linear(gain_db)
+        self._ramp = (target, (target - self._current) / self.ramp_frames)
+
+    def apply(self, x: np.ndarray):
+        """原地处理 float32 的 (frames, CHANNELS) 数组，供混音器使用"""
+        target, step = self._ramp
+        if self._current == target or step == 0.0:
+            self._current = target
+            if target != 1.0:
+                x *= target
+        else:
+            gains = self._current + step * np.arange(1, len(x) + 1, dtype=np.float32)
+            gains = np.minimum(gains, target) if step > 0 else np.maximum(gains, target)
+            self._current = target if gains[-1] == target else float(gains[-1])
+            x *= gains[:, None]
+
+
+def to_float(block: bytes) -> np.ndarray:
+    return np.frombuffer(block, dtype=np.int16).reshape(-1, CHANNELS).astype(np.float32)
+
+
+def to_int16(x: np.ndarray) -> bytes:
+    np.clip(x, -32768, 32767, out=x)
+    return x.astype(np.int16).tobytes()
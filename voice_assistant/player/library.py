@@ -0,0 +1,163 @@
+# library.py
+import json
+import mmap
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from voice_assistant.player import loudness
+from voice_assistant.player.pcm_cache import (
+    PCMCache, SAMPLE_RATE, CHANNELS, SAMPLE_WIDTH, FRAME_BYTES, frames_to_ms
+)
+
+# 默认导入的目录：背景歌单 + 英语听力素材
+DEFAULT_DIRS = [
+    Path("/home/hugd/privateprojects/personalvoicehelper/voice_assistant/mp3s"),
+    Path("/home/hugd/privateprojects/personalvoicehelper/voice_assistant/englishresource"),
+]
+
+
+def _name(path: Path) -> str:
+    # manifest 一律按绝对路径记：调用方可能传相对路径（如 ../voice_assistant/mp3s）
+    return str(Path(path).resolve())
+
+
+class MusicLibrary:
+    """
+    离线曲库：
+      - ingest() 把目录下的 mp3 转码为 PCMCache 使用的 .pcm 文件（同一个 key），
+        运行时播放直接 mmap，不再在设备上跑 ffmpeg
+      - manifest.json 记录每首的时长、采样格式与响度/归一化增益，按 size/mtime 增量刷新
+      - 导入过的文件在 PCMCache 中被 pin 住，不参与磁盘 LRU 淘汰
+    """
+    def __init__(self, pcm_cache: PCMCache, manifest_path: Optional[Path] = None):
+        self.pcm_cache = pcm_cache
+        self.manifest_path = manifest_path or pcm_cache.cache_dir / "manifest.json"
+        self.tracks: Dict[str, dict] = {}
+        self._load()
+
+    # ------------ 内部方法 ------------
+    def _load(self):
+        if self.manifest_path.exists():
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                tracks = json.load(f).get("tracks", {})
+            self.tracks = {_name(Path(k)): v for k, v in tracks.items()}
+        for entry in self.tracks.values():
+            self.pcm_cache.pinned.add(entry["key"])
+
+    def _save(self):
+        data = {"version": 1, "updated": time.strftime("%Y-%m-%d %H:%M:%S"), "tracks": self.tracks}
+        tmp = self.manifest_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.manifest_path)
+
+    def _is_fresh(self, path: Path, entry: Optional[dict]) -> bool:
+        if not entry:
+            return False
+        st = path.stat()
+        return (entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns
+                and self.pcm_cache.pcm_path(path).exists())
+
+    @staticmethod
+    def _measure(pcm_path: Path) -> dict:
+        with open(pcm_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                lufs, peak_db = -70.0, float("-inf")
+            else:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    lufs, peak_db = loudness.measure(mm)
+        return {
+            "loudness_lufs": round(lufs, 2),
+            "peak_dbfs": round(peak_db, 2) if peak_db != float("-inf") else None,
+            "gain_db": round(loudness.normalization_gain(lufs, peak_db), 2),
+        }
+
+    def _ingest_file(self, path: Path) -> dict:
+        pcm_path = self.pcm_cache.ensure_on_disk(path)
+        st = path.stat()
+        frames = pcm_path.stat().st_size // FRAME_BYTES
+        return {
+            "path": _name(path),
+            "key": self.pcm_cache.key(path),
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "frames": frames,
+            "duration_ms": round(frames_to_ms(frames)),
+            "sample_rate": SAMPLE_RATE,
+            "channels": CHANNELS,
+            "sample_width": SAMPLE_WIDTH,
+            **self._measure(pcm_path),
+        }
+
+    # ------------ 对外接口 ------------
+    def ingest(self, dirs: Iterable[Path] = DEFAULT_DIRS, pattern: str = "*.mp3") -> Dict[str, int]:
+        """
+        增量导入：只转码新增/变化的文件，删除已不存在的条目。
+        返回 {"added": n, "updated": n, "skipped": n, "removed": n}
+        """
+        stats = {"added": 0, "updated": 0, "skipped": 0, "removed": 0}
+        seen = set()
+        for d in dirs:
+            if not d.is_dir():
+                print(f"[MusicLibrary] 跳过不存在的目录: {d}")
+                continue
+            for path in sorted(d.glob(pattern)):
+                name = _name(path)
+                seen.add(name)
+                old = self.tracks.get(name)
+                if self._is_fresh(path, old):
+                    # 旧版 manifest 没有响度信息：只补测量，不重新转码
+                    if "gain_db" not in old:
+                        old.update(self._measure(self.pcm_cache.pcm_path(path)))
+                        stats["updated"] += 1
+                    else:
+                        stats["skipped"] += 1
+                    continue
+                try:
+                    entry = self._ingest_file(path)
+                except Exception as e:
+                    print(f"[MusicLibrary] 导入失败 {path.name}: {e}")
+                    continue
+                if old and old["key"] != entry["key"]:
+                    self.pcm_cache.pinned.discard(old["key"])
+                self.pcm_cache.pinned.add(entry["key"])
+                self.tracks[name] = entry
+                stats["updated" if old else "added"] += 1
+                print(f"[MusicLibrary] 已导入: {path.name} ({entry['duration_ms'] / 1000:.1f}s, "
+                      f"{entry['loudness_lufs']} LUFS, gain {entry['gain_db']:+} dB)")
+
+        scanned = {_name(d) for d in dirs}
+        for name in list(self.tracks):
+            if name not in seen and str(Path(name).parent) in scanned:
+                entry = self.tracks.pop(name)
+                self.pcm_cache.remove(entry["key"])
+                stats["removed"] += 1
+
+        self._save()
+        print(f"[MusicLibrary] 导入完成: {stats}")
+        return stats
+
+    def get(self, path: Path) -> Optional[dict]:
+        return self.tracks.get(_name(path))
+
+    def duration_ms(self, path: Path) -> Optional[int]:
+        entry = self.get(path)
+        return entry["duration_ms"] if entry else None
+
+    def gain_db(self, path: Path) -> float:
+        """曲目的响度归一化增益；未导入的曲目返回 0"""
+        entry = self.get(path)
+        return entry.get("gain_db", 0.0) if entry else 0.0
+
+    def paths(self) -> List[Path]:
+        return [Path(p) for p in self.tracks]
+
+
+if __name__ == "__main__":
+    import sys
+
+    # 用法：python -m voice_assistant.player.library [目录 ...]
+    dirs = [Path(a) for a in sys.argv[1:]] or DEFAULT_DIRS
+    MusicLibrary(PCMCache()).ingest(dirs)
@@ -0,0 +1,60 @@
+# loudness.py
+import math
+from typing import Tuple
+
+import numpy as np
+
+from voice_assistant.player.pcm_cache import SAMPLE_RATE, CHANNELS
+
+# 归一化目标响度（LUFS）与增益范围
+TARGET_LUFS = -16.0
+MAX_GAIN_DB = 12.0
+# 峰值余量：归一化后峰值不超过 -1 dBFS
+PEAK_HEADROOM_DB = -1.0
+
+# 门限块长 400ms（BS.1770 的块长，这里不重叠）
+BLOCK_FRAMES = SAMPLE_RATE * 400 // 1000
+# 每次处理约 60s，长曲目也不会一次性占用大量内存
+CHUNK_BLOCKS = 150
+
+
+def measure(pcm: bytes) -> Tuple[float, float]:
+    """
+    近似积分响度：400ms 块均方 + 绝对门限(-70) + 相对门限(-10 LU)，
+    未做 K 计权，足够用于曲目之间的音量拉平。
+    返回 (loudness_lufs, peak_dbfs)。
+    """
+    x = np.frombuffer(pcm, dtype=np.int16)
+    x = x[: len(x) - len(x) % (BLOCK_FRAMES * CHANNELS)]
+    if len(x) == 0:
+        return -70.0, -math.inf
+
+    powers = []
+    peak = 0
+    step = BLOCK_FRAMES * CHANNELS * CHUNK_BLOCKS
+    for i in range(0, len(x), step):
+        chunk = x[i:i + step].astype(np.float32) / 32768.0
+        peak = max(peak, float(np.abs(chunk).max()))
+        blocks = chunk.reshape(-1, BLOCK_FRAMES * CHANNELS)
+        # 各声道功率之和 = 每块样本平方均值 * 声道数
+        powers.append(np.mean(blocks ** 2, axis=1) * CHANNELS)
+    power = np.concatenate(powers)
+
+    def lufs(p):
+        return -0.691 + 10 * np.log10(np.maximum(p, 1e-12))
+
+    gated = power[lufs(power) > -70.0]
+    if len(gated) == 0:
+        return -70.0, 20 * math.log10(peak) if peak else -math.inf
+    rel_gate = lufs(np.mean(gated)) - 10.0
+    gated = gated[lufs(gated) > rel_gate]
+    loudness = float(lufs(np.mean(gated)))
+    peak_db = 20 * math.log10(peak) if peak else -math.inf
+    return loudness, peak_db
+
+
+def normalization_gain(loudness: float, peak_db: float, target: float = TARGET_LUFS) -> float:
+    """把曲目拉到 target 所需的增益（dB），受峰值余量与 ±MAX_GAIN_DB 限制"""
+    gain = target - loudness
+    gain = min(gain, PEAK_HEADROOM_DB - peak_db)
+    return float(max(-MAX_GAIN_DB, min(MAX_GAIN_DB, gain)))
@@ -1,24 +1,44 @@
 # mp3_player.py
-import simpleaudio as sa
-from pydub import AudioSegment
-import threading, time
+import asyncio
+import threading
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, List, Optional, Union
+
+from voice_assistant.player.pcm_cache import PCMCache, ms_to_frames, frames_to_ms
+from voice_assistant.player.library import MusicLibrary
+from voice_assistant.player.playlist import Playlist
+from voice_assistant.player.stream_output import (
+    StreamOutput, Playback, PCMSource, DecoderSource, PushSource, ROLE_VOICE
+)
+from voice_assistant.tasks.executors import POOL_DECODE, run_blocking
+
+# 未命中缓存但预取线程正在解码同一首时，最多等这么久再自己起解码
+PREFETCH_WAIT_S = 1.0
 
 class MP3Player:
-    def __init__(self, files: List[Path], loop: bool = True, vol_db: int = 0, ws_client = None):
-        self.files = files
+    def __init__(self, files: Union[List[Path], Playlist], loop: bool = True, vol_db: int = 0, ws_client = None,
+                 pcm_cache: Optional[PCMCache] = None, output: Optional[StreamOutput] = None,
+                 library: Optional[MusicLibrary] = None):
+        # 统一成 Playlist：支持插队/随机/搜索，仍可按下标访问
+        self.files = files if isinstance(files, Playlist) else Playlist.from_paths(files)
         self.loop = loop
         self.vol_db = vol_db
+        # 解码后的 PCM 缓存：恢复/调音量/切歌不再重复 ffmpeg 解码
+        self.pcm_cache = pcm_cache or PCMCache()
+        # 流式输出：按 block 从读游标取数据，不再整段 sa.play_buffer
+        self.output = output or StreamOutput()
+        self.output.gain_db = vol_db
+        # 曲库中预先算好的每首响度归一化增益，播放时直接作用在该曲目的 gain 上
+        self.library = library
 
         self.idx: int = 0
-        self.play_obj: Optional[sa.PlayObject] = None
+        # 当前曲目的路径：歌单刷新后 order 可能变了，按它找回 idx
+        self.current: Optional[Path] = None
+        self.play_obj: Optional[Playback] = None
         self.paused: bool = False
-        self.offset_ms: int = 0
-        self._start_ts: float = 0.0
+        # 位置按帧计数（整数），暂停/恢复多少次都不会累积误差
+        self.offset_frames: int = 0
 
-        self._monitor_th: Optional[threading.Thread] = None
-        self._monitor_stop: bool = False
         self.lock = threading.Lock()
         # 新增：专门标记歌单是否在“激活”状态
         self._playlist_active = False
@@ -26,57 +46,67 @@ class MP3Player:
         # add ws_client
         self.ws_client = ws_client
 
+    @property
+    def offset_ms(self) -> int:
+        return int(frames_to_ms(self.offset_frames))
+
     # ------------ 内部方法 ------------
-    def _load_segment(self) -> AudioSegment:
-        seg = AudioSegment.from_file(self.files[self.idx]) + self.vol_db
-        return seg.set_channels(2).set_frame_rate(44100)
-
-    def _play_segment(self, seg: AudioSegment, offset: int = 0) -> sa.PlayObject:
-        raw = seg[offset:].raw_data
-        self._start_ts = time.time()
-        return sa.play_buffer(
-            raw,
-            num_channels=seg.channels,
-            bytes_per_sample=seg.sample_width,
-            sample_rate=seg.frame_rate,
-        )
-
-    def _start_monitor(self, remaining_ms: float):
-        # 停止旧线程（仅对非当前线程执行 join）
-        old_th = self._monitor_th
-        if old_th and old_th.is_alive():
-            self._monitor_stop = True
-            if old_th is not threading.current_thread():
-                old_th.join(timeout=0.1)
-
-        # 重置标志，启动新线程
-        self._monitor_stop = False
-
-        def monitor():
-            start = time.time()
-            while not self._monitor_stop and (time.time() - start) * 1000 < remaining_ms:
-                if self.paused:
-                    return
-                time.sleep(0.1)
-            if not self._monitor_stop:
-                self._on_track_end()
-
-        self._monitor_th = threading.Thread(target=monitor, daemon=True)
-        self._monitor_th.start()
+    def _make_source(self, offset_frames: int):
+        path = self.files[self.idx]
+        # 预取线程正在解码这一首时先等它，避免同一文件同时跑两个 ffmpeg
+        if self.pcm_cache.contains(path) or self.pcm_cache.wait_decoding(path, PREFETCH_WAIT_S):
+            # 命中缓存：mmap 上的读游标，O(1)
+            return PCMSource(self.pcm_cache.get(path), offset_frames, name=path.name)
+        # 未命中：先边解码边播，同时后台写缓存，之后的恢复/定位都走缓存
+        self.pcm_cache.prefetch(path)
+        return DecoderSource(path, offset_frames)
+
+    def _prefetch_neighbours(self):
+        # 当前曲目播放期间，后台解码下一首（以及上一首，供 prev() 使用）
+        if len(self.files) < 2:
+            return
+        self.pcm_cache.prefetch(self.files.peek_next(self.idx))
+        self.pcm_cache.prefetch(self.files[self.files.prev_index(self.idx)])
+
+    def _sync_playlist(self):
+        """调用方持有 self.lock；歌单增量刷新（节流），顺序变了就按路径重新定位 idx"""
+        self.files.maybe_refresh()
+        if self.current is None or (self.idx < len(self.files) and self.files[self.idx] == self.current):
+            return
+        try:
+            self.idx = self.files.index(self.current)
+        except ValueError:
+            # 当前曲目已从磁盘删除：退到前一个位置，next() 接着播原来的下一首
+            self.idx = max(min(self.idx, len(self.files)) - 1, 0)
+
+    def _on_playback_done(self, play_obj: Playback):
+        # 由输出的事件线程调用；过期句柄（已切歌/已停止）直接忽略
+        if play_obj.eof and play_obj is self.play_obj:
+            self._on_track_end()
 
     def _on_track_end(self):
         if self.loop:
             self.next()
 
+    def _current_frame(self) -> int:
+        # source 的读游标：已交给输出设备的帧数（暂停/定位从这里续播）
+        if self.play_obj:
+            return self.play_obj.source.frame
+        return self.offset_frames
+
     # ------------ 播放控制 ------------
-    def _start_play(self, offset_ms: int):
-        seg = self._load_segment()
-        self.play_obj = self._play_segment(seg, offset_ms)
+    def _track_gain_db(self) -> float:
+        return self.library.gain_db(self.files[self.idx]) if self.library else 0.0
+
+    def _start_play(self, offset_frames: int):
+        self.current = self.files[self.idx]
+        self.play_obj = self.output.play(self._make_source(offset_frames), gain_db=self._track_gain_db())
         self.paused = False
         msg = f"▶️ Now Playing [{self.idx+1}/{len(self.files)}]: {self.files[self.idx].name}"
         print(msg)
         self.ws_client.send_status_update('info', msg)
-        self._start_monitor(seg.duration_seconds * 1000 - offset_ms)
+        self.play_obj.add_done_callback(self._on_playback_done)
+        self._prefetch_neighbours()
 
 
     def play(self):
@@ -84,7 +114,13 @@ class MP3Player:
             if self.play_obj and self.play_obj.is_playing():
                 return
             self._playlist_active = True
-            self._start_play(self.offset_ms)
+            if self.play_obj and self.paused and not self.play_obj.done:
+                # 暂停后恢复：只是把读游标重新接上输出
+                self.play_obj.resume()
+                self.paused = False
+                print(f"▶️ Resumed @ {self.offset_ms} ms")
+                return
+            self._start_play(self.offset_frames)
 
     def pause(self):
         with self.lock:
@@ -92,12 +128,8 @@ class MP3Player:
                 return
             # 标记歌单未激活（即暂停状态）
             self._playlist_active = False
-            try:
-                elapsed_ms = int(self.play_obj.get_time() * 1000)
-            except AttributeError:
-                elapsed_ms = int((time.time() - self._start_ts) * 1000)
-            self.offset_ms += elapsed_ms
-            self.play_obj.stop()
+            self.play_obj.pause()
+            self.offset_frames = self._current_frame()
             self.paused = True
             print(f"⏸️ Paused @ {self.offset_ms} ms")
 
@@ -109,8 +141,7 @@ class MP3Player:
                 self.play_obj.stop()
             self.play_obj = None
             self.paused = False
-            self.offset_ms = 0
-            self._monitor_stop = True
+            self.offset_frames = 0
             print("⏹️ Stopped")
 
     def next(self):
@@ -118,8 +149,9 @@ class MP3Player:
             if self.play_obj:
                 self.play_obj.stop()
             self.paused = False
-            self.offset_ms = 0
-            self.idx = (self.idx + 1) % len(self.files)
+            self.offset_frames = 0
+            self._sync_playlist()
+            self.idx = self.files.next_index(self.idx)
         self._start_play(0)
 
     def prev(self):
@@ -127,27 +159,62 @@ class MP3Player:
             if self.play_obj:
                 self.play_obj.stop()
             self.paused = False
-            self.offset_ms = 0
-            self.idx = (self.idx - 1) % len(self.files)
+            self.offset_frames = 0
+            self._sync_playlist()
+            self.idx = self.files.prev_index(self.idx)
         self._start_play(0)
 
-    def set_volume(self, db_delta: int):
+    def play_track(self, path: Path):
+        """点播指定曲目（不在歌单顺序里的会插到当前曲目之后）"""
+        with self.lock:
+            if self.play_obj:
+                self.play_obj.stop()
+            self.paused = False
+            self._playlist_active = True
+            self.offset_frames = 0
+            self._sync_playlist()
+            self.idx = self.files.insert_after(self.idx, path)
+        self._start_play(0)
+
+    def shuffle(self, on: bool = True):
         with self.lock:
-            # 记录当前位置
-            current_offset = self.offset_ms
+            self._sync_playlist()
+            current = self.files[self.idx] if len(self.files) else None
+            self.files.shuffle(on, keep=current)
+            self.idx = 0
+
+    def position(self) -> float:
+        """当前播放位置（毫秒）：读游标减去设备里还没发声的缓冲帧"""
+        with self.lock:
+            frame = self._current_frame()
             if self.play_obj and self.play_obj.is_playing():
-                try:
-                    current_offset += int(self.play_obj.get_time() * 1000)
-                except AttributeError:
-                    current_offset += int((time.time() - self._start_ts) * 1000)
+                frame = max(self.offset_frames, frame - self.output.latency_frames)
+            return frames_to_ms(frame)
 
-            # 更新音量并从当前位置重播
+    def seek(self, ms: float):
+        """
+        定位到当前曲目的 ms 处：缓存命中时只移动读游标；
+        流式解码中的曲目则从新位置重新开一路解码。
+        """
+        with self.lock:
+            frame = ms_to_frames(max(0.0, ms))
+            self.offset_frames = frame
+            if self.play_obj and self.play_obj.source.seekable:
+                self.play_obj.source.seek(frame)
+            elif self.play_obj:
+                was_paused = self.paused
+                self.play_obj.stop()
+                self.play_obj = None
+                if not was_paused:
+                    self._start_play(frame)
+            print(f"⏩ Seek @ {self.offset_ms} ms")
+
+    def set_volume(self, db_delta: int):
+        with self.lock:
+            # 音量在输出回调里逐 block 生效，不停止、不重建播放
             self.vol_db += db_delta
+            self.output.gain_db = self.vol_db
             print(f"🔊 Volume Δ {db_delta} dB → offset={self.vol_db}")
-            if self.play_obj:
-                self.play_obj.stop()
-            self.offset_ms = current_offset
-            self._start_play(self.offset_ms)
 
     # ------------ 新增：播放单次文件（用于 TTS） ------------
     # def play_file(self, path: Path, wait: bool = False, resume_playlist: bool = True):
@@ -181,54 +248,94 @@ class MP3Player:
     #     # 后台线程播放，避免阻塞
     #     threading.Thread(target=_play_once, daemon=True).start()
 
-    def play_file(self, was_playing:bool, path: Path, resume_playlist: bool = True):
+    def play_file(self, was_playing:bool, path: Path, resume_playlist: bool = True,
+                  role: str = ROLE_VOICE, on_done: Optional[Callable[[Optional[Playback]], None]] = None):
         """
-        播放单个 mp3（如 TTS），播放完毕后仅在：
-          1) resume_playlist=True
-          2) 调用前 _playlist_active==True
-        时恢复歌单。
+        在背景歌单之上叠加播放单个 mp3（如 TTS、确认音）：
+          - 歌单不停止、不重新解码，播报期间由混音器自动压低音量
+          - 如果调用方事先暂停了歌单，播完后仅在 resume_playlist=True 且
+            was_playing=True 时恢复
+          - on_done(playback) 在播放结束时由输出线程调用（加载失败时参数为 None），
+            调用方据此判断播完，不必自己按时长等待
         """
 
-        def _play_once():
-            # 1) 记录调用前歌单激活状态，杀死旧监控并停止当前播放
-            with self.lock:
-                was_active = was_playing
-                print(f"[play_file lock] was_active={was_active}")
-                # 停监控
-                self._monitor_stop = True
-                if self._monitor_th and self._monitor_th.is_alive():
-                    old = self._monitor_th
-                    if old is not threading.current_thread():
-                        old.join(timeout=0.1)
-                # 停当前播放
-                if self.play_obj:
-                    self.play_obj.stop()
-                    self.play_obj = None
-                # if was_active:
-                #     self.pause()
-
-            print(f"[play_file] was_active={was_active}, resume_playlist={resume_playlist}")
-
-            # 2) 播放 TTS
-            seg = AudioSegment.from_file(path) + self.vol_db
-            play_obj = sa.play_buffer(
-                seg.raw_data,
-                num_channels=seg.channels,
-                bytes_per_sample=seg.sample_width,
-                sample_rate=seg.frame_rate,
-            )
-            print(f"▶️ Now Playing (TTS): {path.name}")
-            play_obj.wait_done()
+        def _on_done(play_obj: Playback):
             print(f"▶️ TTS done: {path.name}")
-
-            # 3) 仅在调用前歌单激活且允许恢复时启动歌单
-            if resume_playlist and was_active:
+            # 歌单仍在播放（只是被压低）时无需任何操作
+            if resume_playlist and was_playing and self.paused:
                 print(f"[play_file] Restoring playlist… time @ {self.offset_ms}ms")
                 self.play()
             else:
                 print("[play_file] Not restoring playlist")
+            if on_done is not None:
+                on_done(play_obj)
+
+        def _failed(e):
+            print(f"[play_file] 加载失败 {path}: {e}")
+            if on_done is not None:
+                on_done(None)
 
-        threading.Thread(target=_play_once, daemon=True).start()
+        def _play_once(pcm: Optional[memoryview] = None):
+            print(f"[play_file] was_active={was_playing}, resume_playlist={resume_playlist}")
+            try:
+                # 已在缓存里（内存或磁盘）：这里只做 mmap，不会跑 ffmpeg
+                if pcm is None:
+                    pcm = self.pcm_cache.get(path)
+            except Exception as e:
+                _failed(e)
+                return
+            play_obj = self.output.play(PCMSource(pcm, name=path.name), role=role)
+            print(f"▶️ Now Playing (TTS): {path.name}")
+            play_obj.add_done_callback(_on_done)
+
+        def _decoded(fut):
+            if fut.cancelled():
+                self.output.call_soon(_failed, "解码被取消")
+            elif fut.exception() is not None:
+                self.output.call_soon(_failed, fut.exception())
+            else:
+                self.output.call_soon(_play_once, fut.result())
+
+        # TTS 文件同样走 PCM 缓存，重复播报不再解码；播放在输出的事件线程中进行，不为每次播报新建线程
+        if self.pcm_cache.contains(path):
+            self.output.call_soon(_play_once)
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # 不在事件循环里（脚本直接调用）：在调用方线程里解码
+            try:
+                pcm = self.pcm_cache.get(path)
+            except Exception as e:
+                self.output.call_soon(_failed, e)
+                return
+            self.output.call_soon(_play_once, pcm)
+            return
+        # 未命中：解码放 decode 线程池（同预取），事件线程只拿解码好的 PCM，不被 ffmpeg 卡住
+        asyncio.ensure_future(run_blocking(POOL_DECODE, self.pcm_cache.get, path)).add_done_callback(_decoded)
+
+    def play_pcm(self, pcm: bytes, name: str = "pcm", role: str = ROLE_VOICE,
+                 on_done: Optional[Callable[[Optional[Playback]], None]] = None):
+        """叠加播放一段内存中的 PCM（PCMCache 同格式，如拼接合成的报时），混音/压低规则同 play_file"""
+        def _play_once():
+            play_obj = self.output.play(PCMSource(memoryview(pcm), name=name), role=role)
+            print(f"▶️ Now Playing (PCM): {name}")
+            if on_done is not None:
+                play_obj.add_done_callback(on_done)
+
+        self.output.call_soon(_play_once)
+
+    def open_stream(self, rate: int, channels: int, name: str = "stream",
+                    on_done: Optional[Callable[[Optional[Playback]], None]] = None) -> PushSource:
+        """
+        打开一路外部推送的 PCM（如流式 TTS），与歌单混音播放。
+        写完后调用 source.end()，打断时调用 source.close()；缓冲读空后 on_done(playback) 被调用。
+        """
+        source = PushSource(rate, channels, name=name)
+        play_obj = self.output.play(source, role=ROLE_VOICE)
+        if on_done is not None:
+            play_obj.add_done_callback(on_done)
+        return source
 
 
 if __name__ == "__main__":
@@ -0,0 +1,282 @@
+# pcm_cache.py
+import hashlib
+import mmap
+import os
+import queue
+import subprocess
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+# 缓存中统一的 PCM 格式：44.1kHz / 立体声 / 16bit
+SAMPLE_RATE = 44100
+CHANNELS = 2
+SAMPLE_WIDTH = 2
+FRAME_BYTES = CHANNELS * SAMPLE_WIDTH
+
+
+def ms_to_bytes(ms: int) -> int:
+    """毫秒 -> 字节偏移（按帧对齐）"""
+    return int(ms) * SAMPLE_RATE // 1000 * FRAME_BYTES
+
+
+def bytes_to_ms(n: int) -> float:
+    """字节数 -> 毫秒"""
+    return n / FRAME_BYTES / SAMPLE_RATE * 1000
+
+
+def ms_to_frames(ms: float) -> int:
+    """毫秒 -> 帧号（向下取整）"""
+    return int(ms * SAMPLE_RATE // 1000)
+
+
+def frames_to_ms(frames: int) -> float:
+    """帧数 -> 毫秒"""
+    return frames * 1000 / SAMPLE_RATE
+
+
+class PCMCache:
+    """
+    解码后 PCM 的 LRU 缓存：
+      - key = 路径 + mtime + size，文件被替换后自动失效
+      - 解码结果落盘为 .pcm 文件，通过 mmap 只读映射，内存由系统按页管理
+      - 内存中最多保留 max_items 个映射，磁盘总量超过 max_disk_bytes 时淘汰最久未用的文件；
+        磁盘上各文件的大小与访问顺序只在启动时扫描一次，之后在内存里增量维护
+      - prefetch() 由后台线程提前解码，映射总量受 max_mem_bytes 约束
+    """
+    def __init__(
+        self,
+        cache_dir: Path = Path("/home/hugd/privateprojects/personalvoicehelper/tmp/pcmcache"),
+        max_items: int = 8,
+        max_disk_bytes: int = 2 * 1024 ** 3,
+        max_mem_bytes: int = 256 * 1024 ** 2,
+    ):
+        self.cache_dir = cache_dir
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_items = max_items
+        self.max_disk_bytes = max_disk_bytes
+        self.max_mem_bytes = max_mem_bytes
+
+        self._items: "OrderedDict[str, memoryview]" = OrderedDict()
+        # 由曲库（library.py）离线导入的文件，磁盘淘汰时跳过
+        self.pinned: set[str] = set()
+        self.lock = threading.Lock()
+        # 每个 key 一把解码锁（带引用计数，最后一个使用者释放时才删除），避免同一首歌被并发解码两次
+        self._decode_locks: dict[str, list] = {}
+        # 磁盘上的 .pcm：key -> 字节数，按最近访问排序
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        self._scan_disk()
+
+        # 预取：单个常驻后台线程，按入队顺序解码
+        self._prefetch_q: "queue.Queue[Path]" = queue.Queue()
+        self._prefetch_th = threading.Thread(target=self._prefetch_worker, daemon=True)
+        self._prefetch_th.start()
+
+    # ------------ 内部方法 ------------
+    @staticmethod
+    def _key(path: Path) -> str:
+        st = path.stat()
+        raw = f"{path.resolve()}|{st.st_mtime_ns}|{st.st_size}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _pcm_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.pcm"
+
+    def _scan_disk(self):
+        files = []
+        for p in self.cache_dir.glob("*.pcm"):
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            files.append((st.st_mtime, p.stem, st.st_size))
+        for _, key, size in sorted(files):
+            self._disk[key] = size
+        self._disk_bytes = sum(self._disk.values())
+
+    def _disk_add(self, key: str, size: int):
+        """调用方持有 self.lock"""
+        self._disk_bytes += size - self._disk.pop(key, 0)
+        self._disk[key] = size
+
+    def _touch(self, key: str):
+        """调用方持有 self.lock；刷新磁盘 LRU 顺序"""
+        if key in self._disk:
+            self._disk.move_to_end(key)
+
+    @contextmanager
+    def _decode_lock(self, key: str) -> Iterator[None]:
+        with self.lock:
+            entry = self._decode_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self.lock:
+                entry[1] -= 1
+                if entry[1] == 0 and self._decode_locks.get(key) is entry:
+                    del self._decode_locks[key]
+
+    def _decode_to_disk(self, src: Path, dst: Path):
+        # ffmpeg 直接输出 s16le 到临时文件（同 DecoderSource），不在内存里攒整首歌；
+        # 先写临时文件再原子替换，避免半截文件被别的线程映射
+        tmp = dst.with_suffix(f".tmp{threading.get_ident()}")
+        try:
+            with open(tmp, "wb") as f:
+                subprocess.run(
+                    ["ffmpeg", "-v", "quiet", "-i", str(src),
+                     "-f", "s16le", "-ac", str(CHANNELS), "-ar", str(SAMPLE_RATE), "-"],
+                    stdout=f, check=True,
+                )
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        os.replace(tmp, dst)
+        size = dst.stat().st_size
+        with self.lock:
+            self._disk_add(dst.stem, size)
+        print(f"[PCMCache] 解码完成: {src.name} -> {dst.name} ({size // 1024} KB)")
+
+    @staticmethod
+    def _map(pcm_path: Path) -> memoryview:
+        with open(pcm_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return memoryview(b"")
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(mm)
+
+    def _mapped_bytes(self) -> int:
+        return sum(len(b) for b in self._items.values())
+
+    def _evict(self):
+        # 1) 内存映射数量 / 总字节数（至少保留最近使用的一个）
+        while len(self._items) > 1 and (
+            len(self._items) > self.max_items or self._mapped_bytes() > self.max_mem_bytes
+        ):
+            key, _ = self._items.popitem(last=False)
+            # 不主动 close：正在播放的缓冲区可能仍引用它，交给 GC 回收
+            print(f"[PCMCache] 淘汰映射: {key[:8]}")
+        # 2) 磁盘占用，按最近访问时间淘汰（只查内存中的记录，不扫描目录）
+        if self._disk_bytes <= self.max_disk_bytes:
+            return
+        for key in list(self._disk):
+            if self._disk_bytes <= self.max_disk_bytes:
+                break
+            if key in self._items or key in self.pinned or key in self._decode_locks:
+                continue
+            self._disk_bytes -= self._disk.pop(key)
+            self._pcm_path(key).unlink(missing_ok=True)
+            print(f"[PCMCache] 淘汰磁盘文件: {key}.pcm")
+
+    # ------------ 对外接口 ------------
+    def key(self, path: Path) -> str:
+        return self._key(path)
+
+    def pcm_path(self, path: Path) -> Path:
+        return self._pcm_path(self._key(path))
+
+    def ensure_on_disk(self, path: Path) -> Path:
+        """只解码落盘、不建立映射（离线导入用），返回 .pcm 路径"""
+        key = self._key(path)
+        pcm_path = self._pcm_path(key)
+        with self._decode_lock(key):
+            if not pcm_path.exists():
+                self._decode_to_disk(path, pcm_path)
+        return pcm_path
+
+    def remove(self, key: str):
+        """删除 key 对应的 .pcm（曲库/预合成库移除条目时用）"""
+        with self.lock:
+            self.pinned.discard(key)
+            self._items.pop(key, None)
+            self._disk_bytes -= self._disk.pop(key, 0)
+        self._pcm_path(key).unlink(missing_ok=True)
+
+    def contains(self, path: Path) -> bool:
+        key = self._key(path)
+        with self.lock:
+            if key in self._items:
+                return True
+        return self._pcm_path(key).exists()
+
+    def wait_decoding(self, path: Path, timeout: float) -> bool:
+        """path 正在被（预取线程）解码时最多等 timeout 秒，返回 .pcm 是否已就绪；没在解码时立即返回"""
+        key = self._key(path)
+        with self.lock:
+            entry = self._decode_locks.get(key)
+        if entry is not None and entry[0].acquire(timeout=timeout):
+            entry[0].release()
+        return self._pcm_path(key).exists()
+
+    def get(self, path: Path) -> memoryview:
+        """
+        返回 path 对应的 PCM（44.1kHz 立体声 16bit），命中时为 O(1)。
+        """
+        key = self._key(path)
+        with self.lock:
+            buf = self._items.get(key)
+            if buf is not None:
+                self._items.move_to_end(key)
+                self._touch(key)
+                return buf
+
+        with self._decode_lock(key):
+            pcm_path = self._pcm_path(key)
+            if not pcm_path.exists():
+                self._decode_to_disk(path, pcm_path)
+            else:
+                # 刷新 mtime：重启后按它恢复磁盘 LRU 顺序
+                os.utime(pcm_path)
+            buf = self._map(pcm_path)
+
+        with self.lock:
+            self._items[key] = buf
+            self._items.move_to_end(key)
+            self._touch(key)
+            self._evict()
+        return buf
+
+    def prefetch(self, path: Path):
+        """后台解码 path，不阻塞调用方；已在内存中的直接跳过"""
+        try:
+            key = self._key(path)
+        except FileNotFoundError:
+            return
+        with self.lock:
+            if key in self._items:
+                return
+        self._prefetch_q.put(path)
+
+    def _prefetch_worker(self):
+        while True:
+            path = self._prefetch_q.get()
+            try:
+                # 超出内存预算的大文件只落盘，不占映射名额
+                key = self._key(path)
+                pcm_path = self._pcm_path(key)
+                est = pcm_path.stat().st_size if pcm_path.exists() else 0
+                with self.lock:
+                    over_budget = self._mapped_bytes() + est > self.max_mem_bytes
+                if over_budget:
+                    self.ensure_on_disk(path)
+                    continue
+                buf = self.get(path)
+                # 提示内核预读页面，切歌时不用再等磁盘 IO
+                if isinstance(buf.obj, mmap.mmap) and hasattr(mmap, "MADV_WILLNEED"):
+                    buf.obj.madvise(mmap.MADV_WILLNEED)
+                print(f"[PCMCache] 预取完成: {path.name}")
+            except Exception as e:
+                print(f"[PCMCache] 预取失败 {path}: {e}")
+            finally:
+                self._prefetch_q.task_done()
+
+    def duration_ms(self, path: Path) -> float:
+        return bytes_to_ms(len(self.get(path)))
+
+    def clear(self):
+        with self.lock:
+            self._items.clear()
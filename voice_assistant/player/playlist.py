@@ -0,0 +1,234 @@
+# playlist.py
+import json
+import os
+import random
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from voice_assistant.player.library import MusicLibrary
+
+DEFAULT_INDEX = Path("/home/hugd/privateprojects/personalvoicehelper/tmp/playlist_index.json")
+# 运行期间切歌/搜索时顺带增量刷新，最多这么久一次（每个目录一次 stat，很便宜）
+REFRESH_INTERVAL_S = 30.0
+
+
+def _tags_from_name(path: Path) -> List[str]:
+    """从文件名/目录名里拆出可搜索的词，如 01-education-1-20250625 -> ["education"]"""
+    words = re.split(r"[-_\s.]+", f"{path.parent.name} {path.stem}".lower())
+    return [w for w in words if w and not w.isdigit()]
+
+
+class Playlist:
+    """
+    歌单 + 磁盘索引：
+      - 索引（path/size/mtime/duration/tags）持久化为 json，启动时直接加载，不扫盘
+      - refresh() 只重扫 mtime 变化过的目录，新文件追加到末尾，已删除的移除；
+        运行期间由 maybe_refresh() 在切歌/搜索时按 REFRESH_INTERVAL_S 节流调用
+      - 支持随机播放、插队（queue_next）和按名字/标签搜索
+    对 MP3Player 表现为一个 Path 序列（len / 下标访问）。
+    """
+    def __init__(
+        self,
+        dirs: Iterable[Path] = (),
+        *,
+        extra_dirs: Iterable[Path] = (),
+        pattern: str = "*.mp3",
+        index_path: Optional[Path] = DEFAULT_INDEX,
+        library: Optional[MusicLibrary] = None,
+    ):
+        # dirs 中的曲目参与顺序播放；extra_dirs 只进索引，供搜索点播
+        self.dirs = [Path(d) for d in dirs]
+        self.extra_dirs = [Path(d) for d in extra_dirs]
+        self.pattern = pattern
+        self.index_path = index_path
+        self.library = library
+
+        self.entries: Dict[str, dict] = {}
+        self.dir_mtimes: Dict[str, int] = {}
+        self.order: List[Path] = []
+        self.shuffled = False
+        self._queue: List[Path] = []
+        self._refreshed_at = 0.0
+        self.lock = threading.RLock()
+
+        known = self._load() and all(str(d) in self.dir_mtimes for d in self.dirs + self.extra_dirs)
+        if known:
+            # 有索引：立即可用，后台增量刷新
+            threading.Thread(target=self.refresh, daemon=True).start()
+        elif self.dirs or self.extra_dirs:
+            self.refresh()
+
+    @classmethod
+    def from_paths(cls, paths: Iterable[Path]) -> "Playlist":
+        """兼容旧接口：直接由文件列表构造，不落索引"""
+        pl = cls(index_path=None)
+        for p in paths:
+            pl._add(Path(p))
+        return pl
+
+    # ------------ 序列接口 ------------
+    # refresh() 可能在后台线程里改 order，读也要持锁
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self.order)
+
+    def __getitem__(self, idx: int) -> Path:
+        with self.lock:
+            return self.order[idx]
+
+    def __iter__(self):
+        with self.lock:
+            return iter(list(self.order))
+
+    def index(self, path: Path) -> int:
+        with self.lock:
+            return self.order.index(Path(path))
+
+    # ------------ 索引 ------------
+    def _load(self) -> bool:
+        if not self.index_path or not self.index_path.exists():
+            return False
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[Playlist] 索引损坏，重新扫描: {e}")
+            return False
+        self.entries = data.get("entries", {})
+        self.dir_mtimes = data.get("dir_mtimes", {})
+        rotation = {str(d) for d in self.dirs}
+        self.order = [Path(p) for p in data.get("order", [])
+                      if p in self.entries and self.entries[p]["dir"] in rotation]
+        print(f"[Playlist] 已加载索引: {len(self.order)} 首 / 共 {len(self.entries)} 条")
+        return True
+
+    def _save(self):
+        if not self.index_path:
+            return
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "updated": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "dir_mtimes": self.dir_mtimes,
+            "order": [str(p) for p in self.order],
+            "entries": self.entries,
+        }
+        tmp = self.index_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.index_path)
+
+    def _entry(self, path: Path, st: os.stat_result) -> dict:
+        duration = self.library.duration_ms(path) if self.library else None
+        return {
+            "dir": str(path.parent),
+            "name": path.name,
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "duration_ms": duration,
+            "tags": _tags_from_name(path),
+        }
+
+    def _add(self, path: Path, rotation: bool = True):
+        self.entries[str(path)] = self._entry(path, path.stat())
+        if rotation and path not in self.order:
+            self.order.append(path)
+
+    def refresh(self) -> bool:
+        """增量刷新：只扫描 mtime 变化过的目录，返回是否有改动"""
+        changed = False
+        with self.lock:
+            self._refreshed_at = time.monotonic()
+            for d, rotation in [(d, True) for d in self.dirs] + [(d, False) for d in self.extra_dirs]:
+                if not d.is_dir():
+                    continue
+                mtime = d.stat().st_mtime_ns
+                if self.dir_mtimes.get(str(d)) == mtime:
+                    continue
+                changed = True
+                on_disk = {str(p): p for p in sorted(d.glob(self.pattern))}
+                for name, p in on_disk.items():
+                    st = p.stat()
+                    old = self.entries.get(name)
+                    if old and old["size"] == st.st_size and old["mtime_ns"] == st.st_mtime_ns:
+                        continue
+                    self.entries[name] = self._entry(p, st)
+                    if rotation and p not in self.order:
+                        self.order.append(p)
+                for name in [n for n, e in self.entries.items() if e["dir"] == str(d)]:
+                    if name not in on_disk:
+                        self.entries.pop(name)
+                        if Path(name) in self.order:
+                            self.order.remove(Path(name))
+                self.dir_mtimes[str(d)] = mtime
+            if changed:
+                self._save()
+                print(f"[Playlist] 索引已刷新: {len(self.order)} 首 / 共 {len(self.entries)} 条")
+        return changed
+
+    def maybe_refresh(self) -> bool:
+        """距上次刷新超过 REFRESH_INTERVAL_S 才调用 refresh()，返回是否有改动"""
+        if time.monotonic() - self._refreshed_at < REFRESH_INTERVAL_S:
+            return False
+        return self.refresh()
+
+    # ------------ 播放顺序 ------------
+    def shuffle(self, on: bool = True, keep: Optional[Path] = None):
+        """打乱/恢复顺序；keep 指定的曲目放在第一位（一般是当前曲目）"""
+        with self.lock:
+            self.shuffled = on
+            if on:
+                random.shuffle(self.order)
+            else:
+                self.order.sort(key=str)
+            if keep is not None and keep in self.order:
+                self.order.remove(keep)
+                self.order.insert(0, keep)
+
+    def queue_next(self, path: Path):
+        """插队：下一次 next() 先播它"""
+        with self.lock:
+            self._queue.append(Path(path))
+
+    def next_index(self, idx: int) -> int:
+        with self.lock:
+            if self._queue:
+                # extra_dirs 中的曲目：插到当前曲目后面
+                return self.insert_after(idx, self._queue.pop(0))
+            return (idx + 1) % len(self.order)
+
+    def peek_next(self, idx: int) -> Path:
+        """next_index() 将要播放的曲目，只读不改（插队曲目不出队、不插入顺序）"""
+        with self.lock:
+            if self._queue:
+                return self._queue[0]
+            return self.order[(idx + 1) % len(self.order)]
+
+    def insert_after(self, idx: int, path: Path) -> int:
+        """确保 path 在顺序中（不在则插到 idx 之后），返回它的下标"""
+        with self.lock:
+            path = Path(path)
+            if path not in self.order:
+                self.order.insert(idx + 1, path)
+            return self.order.index(path)
+
+    def prev_index(self, idx: int) -> int:
+        return (idx - 1) % len(self.order)
+
+    # ------------ 搜索 ------------
+    def search(self, keyword: str, limit: int = 20) -> List[Path]:
+        """按文件名/标签模糊匹配（忽略大小写），只查内存中的索引"""
+        kw = keyword.strip().lower()
+        if not kw:
+            return []
+        # 新放进目录的曲目也能点播到
+        self.maybe_refresh()
+        with self.lock:
+            hits = [
+                Path(name) for name, e in self.entries.items()
+                if kw in e["name"].lower() or any(kw in t for t in e["tags"])
+            ]
+        hits.sort(key=str)
+        return hits[:limit]
@@ -0,0 +1,433 @@
+# stream_output.py
+import audioop
+import queue
+import subprocess
+import threading
+from pathlib import Path
+from typing import Callable, List
+
+import numpy as np
+try:
+    import pyaudio
+except ImportError:
+    # 没有声卡驱动的环境（CI 里跑 simulation 等）也能 import 本模块，只是不能打开 StreamOutput
+    pyaudio = None
+
+from voice_assistant.player.gain import GainStage, to_float, to_int16
+from voice_assistant.player.pcm_cache import (
+    SAMPLE_RATE, CHANNELS, SAMPLE_WIDTH, FRAME_BYTES, bytes_to_ms
+)
+
+# 每次回调输出的帧数：1024 帧 ≈ 23ms
+BLOCK_FRAMES = 1024
+BLOCK_BYTES = BLOCK_FRAMES * FRAME_BYTES
+# 解码器环形缓冲大小：64 个 block ≈ 1.5s，约 256KB
+RING_BYTES = 64 * BLOCK_BYTES
+# 外部推送（流式 TTS）的缓冲：装得下一整句（segmenter.MAX_CHARS 约 15s），
+# 开播前已合成好的分片一次补写进去、合成回调线程写入时都不会阻塞；约 3.5MB
+PUSH_RING_BYTES = 20 * SAMPLE_RATE * FRAME_BYTES
+
+# 混音角色：music 为背景歌单；voice/effect 出声时自动压低 music
+ROLE_MUSIC = "music"
+ROLE_VOICE = "voice"
+ROLE_EFFECT = "effect"
+# 压低背景音乐的幅度与渐变时长
+DUCK_DB = -15
+DUCK_RAMP_MS = 150
+
+
+class RingBuffer:
+    """
+    定长环形缓冲：
+      - 生产者线程 write()，缓冲满时阻塞
+      - 音频回调 read()，永不阻塞，有多少给多少
+    """
+    def __init__(self, capacity: int = RING_BYTES):
+        self.capacity = capacity
+        self._buf = bytearray(capacity)
+        self._r = 0
+        self._size = 0
+        self._closed = False   # 生产者已写完
+        self._aborted = False  # 消费者不要了
+        self._cond = threading.Condition()
+
+    @property
+    def available(self) -> int:
+        return self._size
+
+    @property
+    def eof(self) -> bool:
+        return self._closed and self._size == 0
+
+    def write(self, data: bytes) -> bool:
+        """写入全部数据；被 abort 时返回 False"""
+        mv = memoryview(data)
+        while mv:
+            with self._cond:
+                while self._size == self.capacity and not self._aborted:
+                    self._cond.wait()
+                if self._aborted:
+                    return False
+                w = (self._r + self._size) % self.capacity
+                n = min(len(mv), self.capacity - self._size, self.capacity - w)
+                self._buf[w:w + n] = mv[:n]
+                self._size += n
+            mv = mv[n:]
+        return True
+
+    def read(self, n: int, align: int = FRAME_BYTES) -> bytes:
+        """最多读 n 字节；未写完时只返回整帧，避免声道错位"""
+        with self._cond:
+            n = min(n, self._size)
+            if not self._closed:
+                n -= n % align
+            first = min(n, self.capacity - self._r)
+            out = bytes(self._buf[self._r:self._r + first]) + bytes(self._buf[:n - first])
+            self._r = (self._r + n) % self.capacity
+            self._size -= n
+            self._cond.notify_all()
+        return out
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def abort(self):
+        with self._cond:
+            self._aborted = True
+            self._closed = True
+            self._size = 0
+            self._cond.notify_all()
+
+
+class PCMSource:
+    """
+    已解码 PCM（通常是 PCMCache 的 mmap）上的读游标。
+    暂停/恢复/定位只移动 cursor，不复制整段数据。
+    """
+    seekable = True
+
+    def __init__(self, pcm: memoryview, start_frame: int = 0, name: str = ""):
+        self.pcm = pcm
+        self.name = name
+        self.cursor = min(start_frame * FRAME_BYTES, len(pcm))
+
+    def seek(self, frame: int):
+        self.cursor = max(0, min(frame * FRAME_BYTES, len(self.pcm)))
+
+    @property
+    def total_frames(self) -> int:
+        return len(self.pcm) // FRAME_BYTES
+
+    def read(self, n: int) -> bytes:
+        chunk = self.pcm[self.cursor:self.cursor + n]
+        self.cursor += len(chunk)
+        return chunk
+
+    @property
+    def finished(self) -> bool:
+        return self.cursor >= len(self.pcm)
+
+    @property
+    def frame(self) -> int:
+        return self.cursor // FRAME_BYTES
+
+    @property
+    def position_ms(self) -> float:
+        return bytes_to_ms(self.cursor)
+
+    def close(self):
+        pass
+
+
+class DecoderSource:
+    """
+    缓存未命中时使用：ffmpeg 子进程边解码边写入环形缓冲，
+    首个 block 解出即可出声，内存占用固定为 RING_BYTES。
+    """
+    seekable = False
+
+    def __init__(self, path: Path, start_frame: int = 0, name: str = ""):
+        self.name = name or path.name
+        self.cursor = start_frame * FRAME_BYTES
+        self._ring = RingBuffer()
+        self._proc = subprocess.Popen(
+            ["ffmpeg", "-v", "quiet", "-ss", f"{start_frame / SAMPLE_RATE:.6f}", "-i", str(path),
+             "-f", "s16le", "-ac", str(CHANNELS), "-ar", str(SAMPLE_RATE), "-"],
+            stdout=subprocess.PIPE,
+        )
+        threading.Thread(target=self._feed, daemon=True).start()
+
+    def _feed(self):
+        try:
+            while True:
+                chunk = self._proc.stdout.read(BLOCK_BYTES)
+                if not chunk or not self._ring.write(chunk):
+                    break
+        finally:
+            self._ring.close()
+            self._proc.stdout.close()
+
+    def read(self, n: int) -> bytes:
+        chunk = self._ring.read(n)
+        self.cursor += len(chunk)
+        return chunk
+
+    @property
+    def finished(self) -> bool:
+        return self._ring.eof
+
+    @property
+    def frame(self) -> int:
+        return self.cursor // FRAME_BYTES
+
+    @property
+    def position_ms(self) -> float:
+        return bytes_to_ms(self.cursor)
+
+    def close(self):
+        self._ring.abort()
+        if self._proc.poll() is None:
+            self._proc.kill()
+
+
+class PushSource:
+    """
+    外部推送的 PCM（如流式 TTS 回调）：任意采样率/声道写入，
+    内部转换为统一格式后进入环形缓冲。未 close() 前读空只补静音，不算结束。
+    """
+    seekable = False
+
+    def __init__(self, rate: int = SAMPLE_RATE, channels: int = CHANNELS, name: str = "stream"):
+        self.name = name
+        self.rate = rate
+        self.channels = channels
+        self.cursor = 0
+        self._ring = RingBuffer(PUSH_RING_BYTES)
+        self._ratecv_state = None
+        # 上游分包不一定按帧对齐，零头留到下一次
+        self._remainder = b""
+
+    def write(self, data: bytes) -> bool:
+        in_frame = SAMPLE_WIDTH * self.channels
+        data = self._remainder + data
+        cut = len(data) - len(data) % in_frame
+        data, self._remainder = data[:cut], data[cut:]
+        if not data:
+            return True
+        if self.channels == 1:
+            data = audioop.tostereo(data, SAMPLE_WIDTH, 1, 1)
+        if self.rate != SAMPLE_RATE:
+            data, self._ratecv_state = audioop.ratecv(
+                data, SAMPLE_WIDTH, CHANNELS, self.rate, SAMPLE_RATE, self._ratecv_state
+            )
+        return self._ring.write(data)
+
+    def read(self, n: int) -> bytes:
+        chunk = self._ring.read(n)
+        self.cursor += len(chunk)
+        return chunk
+
+    @property
+    def finished(self) -> bool:
+        return self._ring.eof
+
+    @property
+    def frame(self) -> int:
+        return self.cursor // FRAME_BYTES
+
+    @property
+    def position_ms(self) -> float:
+        return bytes_to_ms(self.cursor)
+
+    def end(self):
+        """生产者写完，缓冲读空后句柄结束"""
+        self._ring.close()
+
+    def close(self):
+        self._ring.abort()
+
+
+class Playback:
+    """
+    播放句柄，接口与 simpleaudio.PlayObject 保持一致（is_playing/stop/wait_done），
+    另外支持 pause()/resume()、单独的音量 gain 以及结束回调 add_done_callback()。
+    """
+    def __init__(self, output: "StreamOutput", source, role: str = ROLE_MUSIC, gain_db: float = 0):
+        self.output = output
+        self.source = source
+        self.role = role
+        self.paused = False
+        self.gain = GainStage(gain_db)
+        # 仅 music 使用：被人声压低时的增益
+        self.duck = GainStage(ramp_ms=DUCK_RAMP_MS)
+        # eof=True 表示 source 自然播完，False 表示被 stop()/替换
+        self.eof = False
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[["Playback"], None]] = []
+
+    def is_playing(self) -> bool:
+        return not self._done.is_set() and not self.paused
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def pause(self):
+        self.paused = True
+
+    def resume(self):
+        self.paused = False
+
+    def stop(self):
+        self.output.stop(self)
+
+    def wait_done(self):
+        self._done.wait()
+
+    def get_time(self) -> float:
+        return self.source.position_ms / 1000
+
+    def add_done_callback(self, fn: Callable[["Playback"], None]):
+        """结束时在输出的事件线程里调用 fn(playback)；已结束则立即派发"""
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(fn)
+                return
+        self.output.call_soon(fn, self)
+
+    def _finish(self, eof: bool = False):
+        with self._lock:
+            if self._done.is_set():
+                return
+            self.eof = eof
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        self.source.close()
+        for fn in callbacks:
+            self.output.call_soon(fn, self)
+
+
+class StreamOutput:
+    """
+    常驻的 PyAudio 回调输出流（44.1kHz 立体声 16bit），同时也是软件混音器：
+      - 每次回调从所有活动 source 各拉 BLOCK_FRAMES 帧，按各自 gain 相加
+      - 有 voice/effect 在播时，music 自动压低 DUCK_DB，结束后渐变恢复
+      - 峰值内存与曲目长度无关，播报期间背景音乐不停止、不重建
+      - 播完由回调直接判定，结束通知在唯一的常驻事件线程里派发，不再轮询
+    """
+    def __init__(self, block_frames: int = BLOCK_FRAMES, duck_db: float = DUCK_DB):
+        self.block_frames = block_frames
+        self.duck_db = duck_db
+        # 总音量在输出路径上实时生效，改音量不需要重建 source
+        self.gain = GainStage()
+        self.lock = threading.Lock()
+        self._active: List[Playback] = []
+        self._ducking = False
+
+        # 事件线程：音频回调里不能做耗时操作，结束通知等统一排队到这里执行
+        self._events: "queue.SimpleQueue" = queue.SimpleQueue()
+        threading.Thread(target=self._event_loop, daemon=True).start()
+
+        if pyaudio is None:
+            raise RuntimeError("未安装 pyaudio，无法打开音频输出")
+        self._pa = pyaudio.PyAudio()
+        self._stream = self._pa.open(
+            format=self._pa.get_format_from_width(SAMPLE_WIDTH),
+            channels=CHANNELS,
+            rate=SAMPLE_RATE,
+            output=True,
+            frames_per_buffer=block_frames,
+            stream_callback=self._callback,
+        )
+        self._stream.start_stream()
+        # 设备侧缓冲的帧数：已交给设备但还没真正发声的部分
+        self.latency_frames = int(self._stream.get_output_latency() * SAMPLE_RATE)
+
+    def _event_loop(self):
+        while True:
+            fn, args = self._events.get()
+            try:
+                fn(*args)
+            except Exception as e:
+                print(f"[StreamOutput] 事件处理失败 {fn}: {e}")
+
+    def call_soon(self, fn: Callable, *args):
+        """在事件线程里执行 fn(*args)"""
+        self._events.put((fn, args))
+
+    @property
+    def gain_db(self) -> float:
+        return self.gain.gain_db
+
+    @gain_db.setter
+    def gain_db(self, db: float):
+        self.gain.set_db(db)
+
+    def play(self, source, role: str = ROLE_MUSIC, gain_db: float = 0) -> Playback:
+        """
+        加入一个 source。music 同时只有一路（新歌替换旧歌），
+        voice/effect 与现有的声音叠加播放。
+        """
+        pb = Playback(self, source, role, gain_db)
+        with self.lock:
+            if role == ROLE_MUSIC and self._ducking:
+                pb.duck.set_db(self.duck_db)
+            replaced = [p for p in self._active if role == ROLE_MUSIC and p.role == ROLE_MUSIC]
+            self._active = [p for p in self._active if p not in replaced] + [pb]
+        for old in replaced:
+            old._finish()
+        return pb
+
+    def stop(self, pb: Playback, eof: bool = False):
+        with self.lock:
+            if pb in self._active:
+                self._active.remove(pb)
+        pb._finish(eof)
+
+    def _update_ducking(self, playing: List[Playback]):
+        ducking = any(p.role != ROLE_MUSIC for p in playing)
+        if ducking != self._ducking:
+            self._ducking = ducking
+            for p in self._active:
+                if p.role == ROLE_MUSIC:
+                    p.duck.set_db(self.duck_db if ducking else 0)
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        need = frame_count * FRAME_BYTES
+        with self.lock:
+            playing = [p for p in self._active if not p.paused]
+            self._update_ducking(playing)
+        if not playing:
+            return bytes(need), pyaudio.paContinue
+
+        mix = np.zeros((frame_count, CHANNELS), dtype=np.float32)
+        finished = []
+        for pb in playing:
+            data = pb.source.read(need)
+            if len(data) < need:
+                if pb.source.finished:
+                    finished.append(pb)
+                # 不足部分补静音（解码跟不上时也是如此）
+                data = bytes(data) + bytes(need - len(data))
+            x = to_float(data)
+            pb.gain.apply(x)
+            if pb.role == ROLE_MUSIC:
+                pb.duck.apply(x)
+            mix += x
+
+        for pb in finished:
+            self.stop(pb, eof=True)
+        self.gain.apply(mix)
+        return to_int16(mix), pyaudio.paContinue
+
+    def close(self):
+        with self.lock:
+            active, self._active = self._active, []
+        for pb in active:
+            pb._finish()
+        self._stream.stop_stream()
+        self._stream.close()
+        self._pa.terminate()
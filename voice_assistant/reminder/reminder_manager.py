@@ -7,8 +7,14 @@ import schedule
 from typing import Dict, List, Union
 from datetime import datetime
 
+from voice_assistant.nlu.nlu import reminder_fire_text
 from voice_assistant.tasks.speak_task import SpeakTextTask
 from voice_assistant.tasks.task_manager4 import AudioScheduler
+from voice_assistant.tts.phrase_bank import reminder_phrases
+
+# 提醒希望到点立即播报（deadline 0s），排队超过 10 分钟仍未播报则丢弃
+REMINDER_DEADLINE_S = 0
+REMINDER_TTL_S = 600
 
 class Reminder:
     def __init__(self, at_time: str, message: str):
@@ -47,6 +53,7 @@ class ReminderManager:
         self.reminders[r.id] = r
         self.jobs[r.id] = job
         print(f"[ReminderManager] Added {r}")
+        self._warm_phrases()
         return r.id
 
     def list(self) -> List[Reminder]:
@@ -86,8 +93,15 @@ class ReminderManager:
         # 删除数据
         r = self.reminders.pop(rid)
         print(f"[ReminderManager] Removed {r}")
+        self._warm_phrases()
         return True
 
+    def _warm_phrases(self):
+        """提醒有变化时，后台预合成到点播报和“列出提醒”要说的话"""
+        bank = getattr(self.scheduler, "phrase_bank", None)
+        if bank is not None:
+            bank.warm_up({t: None for t in reminder_phrases(self.list())})
+
     def _fire(self, rid: str):
         """
         schedule 到点后调用，把提醒交给语音助手播报
@@ -95,11 +109,19 @@ class ReminderManager:
         r = self.reminders.get(rid)
         if not r:
             return
-        now = datetime.now().strftime("%H点%M分")
-        text = f"现在是{now}，提醒您：{r.message}"
+        message = r.message
+
+        def text():
+            # 开口时才取当前时间，排队耽误了也不会报错时间
+            return reminder_fire_text(message, datetime.now())
+
         print(f"[ReminderManager] 🔔 Fire {r}")
         # 播报一次后，如果想每天重复就注释掉 next 两行
-        self.scheduler.enqueue(SpeakTextTask(text, priority=20,resumable=True))
+        # _fire 在 schedule 线程里执行，需切回调度循环线程入队（否则唤不醒调度循环）
+        self.scheduler.enqueue_threadsafe(SpeakTextTask(
+            text, priority=20, resumable=True,
+            deadline_s=REMINDER_DEADLINE_S, ttl_s=REMINDER_TTL_S,
+        ))
         # 如果只提醒一次，取消并移除
         # schedule.cancel_job(self.jobs.pop(rid))
         # self.reminders.pop(rid, None)
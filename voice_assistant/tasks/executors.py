@@ -0,0 +1,100 @@
+# executors.py
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict
+
+# 按负载类型划分的线程池，任务里的阻塞调用都走这里，不再用 run_in_executor(None, ...)
+POOL_NETWORK = "network"   # TTS 合成、LLM 流、视觉模型、天气接口等网络 I/O
+POOL_DECODE = "decode"     # pydub/ffmpeg 音频解码、切分、导出
+POOL_CPU = "cpu"           # 图片缩放/编码等本地计算
+
+# (线程数, 线程全忙时最多再排队几个)；排满后调用方在协程里等待（背压），不会无限堆积。
+# network 线程数大于 network 通道并发（LANE_LIMITS），视觉请求占满通道时仍有线程留给 TTS
+POOL_LIMITS = {
+    POOL_NETWORK: (8, 16),
+    POOL_DECODE: (2, 8),
+    POOL_CPU: (2, 4),
+}
+
+
+class BoundedExecutor:
+    """
+    有界线程池：workers 个线程 + backlog 个排队名额。
+    名额在线程真正执行完才归还，调用方被取消时已经在跑的阻塞调用仍占着名额。
+    """
+    def __init__(self, name: str, workers: int, backlog: int):
+        self.name = name
+        self.workers = workers
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"va-{name}")
+        self._slots = asyncio.Semaphore(workers + backlog)
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.active = 0
+        self.waiting = 0
+        self.max_wait_s = 0.0
+
+    def _release(self, loop: asyncio.AbstractEventLoop):
+        with self._lock:
+            self.active -= 1
+        loop.call_soon_threadsafe(self._slots.release)
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        t0 = time.monotonic()
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.max_wait_s = max(self.max_wait_s, time.monotonic() - t0)
+        with self._lock:
+            self.submitted += 1
+            self.active += 1
+        cf = self._pool.submit(functools.partial(fn, *args, **kwargs))
+        cf.add_done_callback(lambda _: self._release(loop))
+        return await asyncio.wrap_future(cf)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "active": self.active,
+            "waiting": self.waiting,
+            "submitted": self.submitted,
+            "max_wait_ms": round(self.max_wait_s * 1000, 1),
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_pools: Dict[str, BoundedExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+def get_executor(pool: str) -> BoundedExecutor:
+    with _pools_lock:
+        ex = _pools.get(pool)
+        if ex is None:
+            workers, backlog = POOL_LIMITS[pool]
+            ex = _pools[pool] = BoundedExecutor(pool, workers, backlog)
+        return ex
+
+
+async def run_blocking(pool: str, fn: Callable, *args, **kwargs):
+    """在 pool 对应的线程池里执行阻塞函数 fn(*args, **kwargs) 并等待结果"""
+    return await get_executor(pool).run(fn, *args, **kwargs)
+
+
+def executor_stats() -> dict:
+    with _pools_lock:
+        return {name: ex.stats() for name, ex in _pools.items()}
+
+
+def shutdown():
+    with _pools_lock:
+        for ex in _pools.values():
+            ex.shutdown()
+        _pools.clear()
@@ -6,7 +6,8 @@ import configparser
 from pathlib import Path
 from uuid import uuid4
 
-from voice_assistant.tasks.task_manager4 import AsyncVoiceTask, AudioScheduler
+from voice_assistant.tasks.task_manager4 import AsyncVoiceTask, AudioScheduler, LANE_NETWORK
+from voice_assistant.tasks.executors import POOL_CPU, POOL_NETWORK, run_blocking
 
 from voice_assistant.player.mp3_player import  MP3Player
 from datetime import datetime
@@ -32,8 +33,11 @@ class ImageUnderstandTask(AsyncVoiceTask):
       2) TTS 生成 MP3
       3) 中断歌单播放并播放 TTS，结束后恢复
     """
+    # 只调用视觉模型并把结果推到 WebUI，不出声，不占用 speaker 通道
+    lane = LANE_NETWORK
+
     def __init__(self, was_playing=False, prompt = "这个图里有什么", ws_client=None):
-        super().__init__(name="Weather", priority=15, resumable=False)
+        super().__init__(name="ImageUnderstand", priority=15, resumable=False)
         self.player = None
         self.was_playing = was_playing
         self.ws_client = ws_client
@@ -42,7 +46,9 @@ class ImageUnderstandTask(AsyncVoiceTask):
 
     async def execute(self):
         # --- 1) 查询天气 ---
-        latest_file = max(glob.glob(f"{IMAGE_DIR}/*"), key=os.path.getmtime)
+        latest_file = await run_blocking(
+            POOL_CPU, lambda: max(glob.glob(f"{IMAGE_DIR}/*"), key=os.path.getmtime)
+        )
         result = await self._understand(latest_file, self.prompt)
         self.ws_client.send_status_update('info', f"{result}")
         print(f"[ImageUnderstandTask] 图片理解结果：{result}")
@@ -50,7 +56,8 @@ class ImageUnderstandTask(AsyncVoiceTask):
     async def _understand(self, image_path: str, prompt: str) -> str:
         # 本地图片需 file:// 协议
         print(image_path)
-        local_url = img_to_base64_uri(image_path)
+        # 读图 + base64 编码放 cpu 线程池，视觉模型调用放 network 线程池，都不阻塞调度循环
+        local_url = await run_blocking(POOL_CPU, img_to_base64_uri, image_path)
         messages = [
             {"role": "system", "content": [{"text": "You are a helpful assistant."}]},
             {
@@ -61,7 +68,9 @@ class ImageUnderstandTask(AsyncVoiceTask):
                 ]
             }
         ]
-        response = MultiModalConversation.call(
+        response = await run_blocking(
+            POOL_NETWORK,
+            MultiModalConversation.call,
             # model = "qwen-vl-plus",
             model="qwen2.5-vl-3b-instruct",  # 也可换成 qwen2.5-vl-3b-instruct
             messages=messages
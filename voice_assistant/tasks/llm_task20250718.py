@@ -9,6 +9,7 @@ from dashscope import Generation
 from dashscope.audio.tts_v2 import SpeechSynthesizer, AudioFormat, ResultCallback
 import configparser
 from voice_assistant.tasks.task_manager4 import AsyncVoiceTask
+from voice_assistant.tasks.executors import POOL_NETWORK, run_blocking
 
 # 读取配置
 cfg = configparser.ConfigParser()
@@ -27,16 +28,21 @@ LLM_MODEL = "qwen-turbo"
 
 class _StreamCallback(ResultCallback):
     """
-    1) 在 on_open 时只打开一次 PyAudio 输出流
+    1) 在 on_open 时只打开一次输出流（有 MP3Player 时走混音器，与背景音乐叠加）
     2) on_data 直接非阻塞写入
     3) on_close 时统一清理
     """
-    def __init__(self):
+    def __init__(self, mp3_player=None):
         self._stop = threading.Event()
+        self._mp3_player = mp3_player
+        self._source = None
         self._player = None
         self._stream = None
 
     def on_open(self):
+        if self._mp3_player is not None:
+            self._source = self._mp3_player.open_stream(rate=22050, channels=1, name="LLMChat")
+            return
         # 只打开 output=True 的流，不打开 capture
         self._player = pyaudio.PyAudio()
         self._stream = self._player.open(
@@ -52,12 +58,17 @@ class _StreamCallback(ResultCallback):
             return
         # 非阻塞写入
         try:
+            if self._source is not None:
+                self._source.write(data)
+                return
             self._stream.write(data, exception_on_underflow=False)
         except Exception:
             pass
 
     def on_close(self):
         # 合成完成或打断后只做一次清理
+        if self._source is not None:
+            self._source.end()
         if self._stream:
             try: self._stream.stop_stream()
             except: pass
@@ -66,6 +77,8 @@ class _StreamCallback(ResultCallback):
     def stop(self):
         # 打断合成：后续 on_data 直接丢弃
         self._stop.set()
+        if self._source is not None:
+            self._source.close()
 
 
 class LLMConversationTask(AsyncVoiceTask):
@@ -79,15 +92,16 @@ class LLMConversationTask(AsyncVoiceTask):
         self._callback = None
         self._synthesizer = None
         self.ws_client = ws_client
+        # 由调度器注入，TTS 流与背景音乐混音
+        self.player = None
 
     async def execute(self):
-        loop = asyncio.get_running_loop()
-        # 在 executor 中运行同步流式代码
-        await loop.run_in_executor(None, self._run_stream)
+        # 在 network 线程池中运行同步流式代码
+        await run_blocking(POOL_NETWORK, self._run_stream)
 
     def _run_stream(self):
         # 准备回调和合成器
-        self._callback = _StreamCallback()
+        self._callback = _StreamCallback(self.player)
         self._synthesizer = SpeechSynthesizer(
             model=TTS_MODEL,
             voice=TTS_VOICE,
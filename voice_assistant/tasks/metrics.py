@@ -0,0 +1,116 @@
+# metrics.py
+import bisect
+import time
+from collections import defaultdict
+from typing import Dict, Optional
+
+# 直方图桶上界（毫秒），最后一个桶收纳更大的值
+BUCKETS_MS = [5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, 60000]
+
+# 每个任务记录的阶段（见 AsyncVoiceTask.timing）
+STAGES = ("queue_wait", "prepare", "first_audio", "play", "e2e")
+
+
+class Histogram:
+    """固定桶的耗时直方图：O(1) 记录，分位数取所在桶的上界（足够定位瓶颈）"""
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, seconds: float):
+        ms = max(0.0, seconds * 1000)
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.sum_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                # 桶上界不超过实际最大值
+                return round(min(BUCKETS_MS[i], self.max_ms), 1) if i < len(BUCKETS_MS) else round(self.max_ms, 1)
+        return round(self.max_ms, 1)
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.sum_ms / self.count, 1) if self.count else None,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "max_ms": round(self.max_ms, 1),
+        }
+
+
+class SchedulerMetrics:
+    """
+    AudioScheduler 的运行指标：
+      - 按任务类型（task.name）统计排队等待、prepare、play、端到端（入队到播完）耗时
+      - 抢占次数（按 被抢占者<-抢占者 计数）、挂起/恢复、合并、过期丢弃
+      - 各通道队列深度（当前值 / 历史最大）
+    """
+    def __init__(self):
+        self.started_at = time.time()
+        self.hist: Dict[str, Dict[str, Histogram]] = defaultdict(lambda: defaultdict(Histogram))
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.preemptions: Dict[str, int] = defaultdict(int)
+        self.queue_depth: Dict[str, int] = {}
+        self.queue_depth_max: Dict[str, int] = defaultdict(int)
+        self.finished: Dict[str, int] = defaultdict(int)
+        # 未播完就结束（被取消或出错）的次数
+        self.aborted: Dict[str, int] = defaultdict(int)
+
+    def incr(self, name: str, n: int = 1):
+        self.counters[name] += n
+
+    def preempted(self, victim: str, by: str):
+        self.counters["preemptions"] += 1
+        self.preemptions[f"{victim}<-{by}"] += 1
+
+    def sample_depth(self, lane: str, depth: int):
+        self.queue_depth[lane] = depth
+        if depth > self.queue_depth_max[lane]:
+            self.queue_depth_max[lane] = depth
+
+    def task_done(self, name: str, timing: Dict[str, float], completed: bool):
+        """任务结束时调用；timing 为 monotonic 时间戳，缺哪个阶段就跳过哪个"""
+        if completed:
+            self.finished[name] += 1
+        else:
+            self.aborted[name] += 1
+        spans = {
+            "queue_wait": ("enqueued", "dispatched"),
+            "prepare": ("prepare_start", "prepare_end"),
+            # 开始 play 到真正出声（流式 TTS 为第一个分片写入输出）
+            "first_audio": ("play_start", "first_audio"),
+            "play": ("play_start", "play_end"),
+            "e2e": ("enqueued", "play_end"),
+        }
+        for stage, (a, b) in spans.items():
+            if stage == "e2e" and not completed:
+                continue
+            if a in timing and b in timing:
+                self.hist[name][stage].observe(timing[b] - timing[a])
+
+    def snapshot(self) -> dict:
+        tasks: Dict[str, dict] = {}
+        for name, stages in self.hist.items():
+            tasks[name] = {s: stages[s].snapshot() for s in STAGES if s in stages}
+        for name in set(self.finished) | set(self.aborted):
+            tasks.setdefault(name, {})
+            tasks[name]["finished"] = self.finished[name]
+            tasks[name]["aborted"] = self.aborted[name]
+        return {
+            "uptime_s": round(time.time() - self.started_at),
+            "tasks": tasks,
+            "counters": dict(self.counters),
+            "preemptions": dict(self.preemptions),
+            "queue_depth": dict(self.queue_depth),
+            "queue_depth_max": dict(self.queue_depth_max),
+        }
@@ -7,6 +7,7 @@ from uuid import uuid4
 from voice_assistant.tasks.task_manager4 import AsyncVoiceTask, AudioScheduler
 
 from voice_assistant.player.mp3_player import  MP3Player
+from voice_assistant.player.stream_output import ROLE_EFFECT
 from datetime import datetime
 from voice_assistant.utils.tts_utils    import speech_synthesize
 
@@ -23,5 +24,5 @@ class PlayAudioTask(AsyncVoiceTask):
 
     async def execute(self):
         print(f"[PlayAudioTask] 开始播放音频：{self.audio_path}")
-        self.player.play_file(self.was_playing, self.audio_path, resume_playlist=True)
+        self.player.play_file(self.was_playing, self.audio_path, resume_playlist=True, role=ROLE_EFFECT)
         print("[PlayAudioTask] 播放完成")
\ No newline at end of file
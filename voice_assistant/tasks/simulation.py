@@ -0,0 +1,688 @@
+# simulation.py
+"""
+AudioScheduler 的确定性仿真 + 基准测试。
+
+真实的 AudioScheduler 跑在虚拟时钟的事件循环上（asyncio.sleep 不真的等待，时间直接跳到
+下一个定时器）。播报用的是真实的 SpeakTextTask / WeatherTask（合并合成、流式合成、
+长文本逐句流水线都照常走），只有播放器和 TTS 后端换成按耗时模型计时的假实现（FakeBackend），
+因此在没有声卡、没有网络的机器上也能在几秒内回放几小时的命令序列，结果完全可复现。
+
+命令序列（trace）是 JSONL，每行一个事件：
+    {"t": 12.5, "kind": "reminder", "text": "提醒：喝水"}
+kind 取值：music / stop_music / speak / reminder / time / chat / weather / image；
+speak 可用 "texts": [...] 表示同一时刻连续入队多条（如“列出提醒”）。
+
+用法：
+    python -m voice_assistant.tasks.simulation                     # 跑内置场景
+    python -m voice_assistant.tasks.simulation --trace cmds.jsonl  # 回放录制的 trace
+    python -m voice_assistant.tasks.simulation --dump mixed.jsonl  # 导出内置场景的 trace
+真实运行时可用 TraceRecorder(scheduler, path) 录制 trace。
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import random
+import selectors
+import shutil
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from voice_assistant.player.pcm_cache import FRAME_BYTES, SAMPLE_RATE
+from voice_assistant.tasks import speak_task
+from voice_assistant.tasks.speak_task import SEGMENT_FORMAT, SPLIT_MODEL, SpeakTextTask
+from voice_assistant.tasks.task_manager4 import (
+    LANE_NETWORK,
+    AsyncVoiceTask,
+    AudioScheduler,
+    PlayMusicTask,
+)
+from voice_assistant.tasks.weather_task20250718 import WeatherTask
+from voice_assistant.utils.tts_cache import TTSCache
+from voice_assistant.utils.tts_utils import STREAM_FORMAT, TTS_FORMAT, TTS_MODEL, TTS_VOICE
+
+# 与 reminder_manager.py / wakeup_image_understand.py 中的取值保持一致
+REMINDER_PRIORITY = 20
+REMINDER_TTL_S = 600
+TIME_TTL_S = 60
+
+# trace 回放完后最多再跑多久（虚拟秒），让排队的任务播完
+DRAIN_S = 600
+
+
+# ------------ 虚拟时钟 ------------
+class _VirtualSelector(selectors.BaseSelector):
+    """
+    包一层真实 selector：有就绪的 fd（如跨线程唤醒）照常返回；
+    否则不阻塞，直接把虚拟时钟拨到下一个定时器。
+    """
+    def __init__(self, loop: "VirtualClockLoop"):
+        self._loop = loop
+        self._real = selectors.DefaultSelector()
+
+    def register(self, fileobj, events, data=None):
+        return self._real.register(fileobj, events, data)
+
+    def unregister(self, fileobj):
+        return self._real.unregister(fileobj)
+
+    def modify(self, fileobj, events, data=None):
+        return self._real.modify(fileobj, events, data)
+
+    def get_map(self):
+        return self._real.get_map()
+
+    def close(self):
+        self._real.close()
+
+    def select(self, timeout=None):
+        ready = self._real.select(0)
+        if ready or timeout == 0:
+            return ready
+        if timeout is None:
+            # 没有定时器也没有就绪任务：只可能在等别的线程
+            return self._real.select(None)
+        self._loop.advance(timeout)
+        return []
+
+
+class VirtualClockLoop(asyncio.SelectorEventLoop):
+    """time() 返回虚拟时间的事件循环；空闲时时间直接跳到下一个定时器"""
+    def __init__(self):
+        self._vtime = 0.0
+        super().__init__(selector=_VirtualSelector(self))
+
+    def time(self) -> float:
+        return self._vtime
+
+    def advance(self, seconds: float):
+        self._vtime += seconds
+
+
+def run_virtual(coro):
+    """在一个新的虚拟时钟循环里跑完 coro，返回它的结果"""
+    loop = VirtualClockLoop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        for t in asyncio.all_tasks(loop):
+            t.cancel()
+        loop.run_until_complete(asyncio.sleep(0))
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+# ------------ 假播放器 / 假后端 ------------
+@dataclass
+class CostModel:
+    """假后端的耗时模型（秒），jitter 为相对抖动"""
+    tts_rtt_s: float = 0.35         # 每次合成请求的固定开销
+    tts_per_char_s: float = 0.012
+    split_s: float = 0.05           # 合并合成的音频按句切开（解码 + 导出）
+    speech_chars_per_s: float = 4.5  # 播放时长：每秒约 4.5 个字
+    llm_first_token_s: float = 0.8
+    weather_api_s: float = 0.4
+    vision_s: float = 3.0
+    jitter: float = 0.2
+
+
+class FakePlaylist(list):
+    def search(self, keyword: str, limit: int = 20) -> List[Path]:
+        return []
+
+    def queue_next(self, path: Path):
+        pass
+
+
+class FakeStream:
+    """open_stream() 返回的 PushSource 替身：end_after() 之后按时长播完，close() 立即结束"""
+    def __init__(self, on_done=None):
+        self._on_done = on_done
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def end_after(self, seconds: float):
+        self._timer = asyncio.get_running_loop().call_later(seconds, self._finish)
+
+    def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._finish()
+
+    def _finish(self):
+        on_done, self._on_done = self._on_done, None
+        if on_done is not None:
+            on_done(None)
+
+
+class FakePlayer:
+    """只记录状态、不出声的 MP3Player 替身（满足 PlayMusicTask / SpeakTextTask / 调度器用到的接口）"""
+    def __init__(self, durations: Optional[Dict[Path, float]] = None):
+        self.files = FakePlaylist([Path(f"track{i:02d}.mp3") for i in range(10)])
+        self.play_obj = None
+        self.playing = False
+        self.volume_db = 0
+        # 文件 -> 播放时长（秒），由 FakeBackend 合成时登记
+        self.durations = durations if durations is not None else {}
+
+    def play(self):
+        self.playing = True
+
+    def pause(self):
+        self.playing = False
+
+    def stop(self):
+        self.playing = False
+
+    def next(self):
+        pass
+
+    def prev(self):
+        pass
+
+    def play_track(self, path: Path):
+        self.playing = True
+
+    def set_volume(self, delta_db: int):
+        self.volume_db += delta_db
+
+    # ------------ 人声：按时长计时，播完回调 on_done ------------
+    @staticmethod
+    def _after(seconds: float, on_done):
+        stream = FakeStream(on_done)
+        stream.end_after(seconds)
+
+    def play_file(self, was_playing=False, path=None, resume_playlist=True, role=None, on_done=None):
+        self._after(self.durations.get(Path(path), 1.0), on_done)
+
+    def play_pcm(self, pcm: bytes, name: str = "pcm", role=None, on_done=None):
+        self._after(len(pcm) / FRAME_BYTES / SAMPLE_RATE, on_done)
+
+    def open_stream(self, rate: int, channels: int, name: str = "stream", on_done=None) -> FakeStream:
+        return FakeStream(on_done)
+
+
+class SimWorld:
+    """一次仿真的共享状态：耗时模型、随机数、创建过的全部任务"""
+    def __init__(self, seed: int = 0, cost: Optional[CostModel] = None):
+        self.rng = random.Random(seed)
+        self.cost = cost or CostModel()
+        self.tasks: List[AsyncVoiceTask] = []
+        self.coalesced = 0
+
+    def cost_of(self, seconds: float) -> float:
+        j = self.cost.jitter
+        return seconds * self.rng.uniform(1 - j, 1 + j)
+
+    def speech_s(self, text: str) -> float:
+        return len(text) / self.cost.speech_chars_per_s
+
+
+class FakeStreamingSynthesis:
+    """StreamingSynthesis 的替身：首包在 tts_rtt_s 后到达，整句合成完写入 TTS 缓存"""
+    def __init__(self, backend: "FakeBackend", text: str):
+        self.backend = backend
+        self.text = text
+        self.error: Optional[str] = None
+        self.received = False
+        self._sink: Optional[FakeStream] = None
+        self._on_first = None
+        self._timers: List[asyncio.TimerHandle] = []
+
+    def run(self):
+        w = self.backend.world
+        self.backend.streams += 1
+        first = w.cost_of(w.cost.tts_rtt_s)
+        total = first + w.cost_of(len(self.text) * w.cost.tts_per_char_s)
+        loop = asyncio.get_running_loop()
+        self._timers = [loop.call_later(first, self._first_chunk), loop.call_later(total, self._complete)]
+        self.backend.charge(total)
+
+    def _first_chunk(self):
+        self.received = True
+        if self._sink is not None:
+            self._start()
+
+    def _complete(self):
+        self.backend.store(self.text, STREAM_FORMAT)
+
+    def _start(self):
+        # 分片到了就开口，合成比播放快，播完的时间按整句时长算
+        if self._on_first is not None:
+            self._on_first()
+            self._on_first = None
+        self._sink.end_after(self.backend.world.speech_s(self.text))
+
+    def attach(self, source: FakeStream, on_first=None):
+        self._sink, self._on_first = source, on_first
+        if self.received:
+            self._start()
+
+    def cancel(self):
+        for h in self._timers:
+            h.cancel()
+        if self._sink is not None:
+            self._sink.close()
+
+
+class FakeBackend:
+    """
+    假 TTS 后端：替换 speak_task 模块里的 speech_synthesize / StreamingSynthesis /
+    _split_to_cache / get_cache / run_blocking，真实的 SpeakTextTask 照常运行：
+      - 阻塞调用直接在事件循环线程里执行，耗时由 charge() 记账，调用方随后 sleep 对应的
+        虚拟时长（不经过线程池，跨线程的时序不会打乱虚拟时钟）
+      - TTS 缓存是真实的 TTSCache（临时目录，文件内容为空），各文件的时长另记在 durations
+    """
+    def __init__(self, world: SimWorld):
+        self.world = world
+        self.cache_dir = Path(tempfile.mkdtemp(prefix="va-sim-tts-"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.cache = TTSCache(self.cache_dir)
+        self.durations: Dict[Path, float] = {}
+        self.requests = 0
+        self.streams = 0
+        self._charged = 0.0
+        self._saved: Dict[str, object] = {}
+
+    def charge(self, seconds: float):
+        self._charged += seconds
+
+    def store(self, text: str, fmt: str, model: str = TTS_MODEL) -> Path:
+        path = self.cache.put(text, model, TTS_VOICE, fmt, b"")
+        self.durations[path] = self.world.speech_s(text)
+        return path
+
+    # ------------ 替换 speak_task 里的实现 ------------
+    async def run_blocking(self, pool: str, fn, *args, **kwargs):
+        self._charged = 0.0
+        result = fn(*args, **kwargs)
+        cost, self._charged = self._charged, 0.0
+        if cost > 0:
+            await asyncio.sleep(cost)
+        return result
+
+    def speech_synthesize(self, text: str, out_dir: Optional[Path] = None) -> Path:
+        w = self.world
+
+        def _synthesize() -> bytes:
+            self.requests += 1
+            self.charge(w.cost_of(w.cost.tts_rtt_s + len(text) * w.cost.tts_per_char_s))
+            return b""
+
+        path = self.cache.get_or_create(text, TTS_MODEL, TTS_VOICE, TTS_FORMAT, _synthesize)
+        self.durations[path] = w.speech_s(text)
+        return path
+
+    def split_to_cache(self, mp3_path: Path, texts: List[str]) -> List[Path]:
+        self.charge(self.world.cost_of(self.world.cost.split_s))
+        return [self.store(t, SEGMENT_FORMAT, SPLIT_MODEL) for t in texts]
+
+    def streaming_synthesis(self, text: str, out_dir: Optional[Path] = None) -> FakeStreamingSynthesis:
+        return FakeStreamingSynthesis(self, text)
+
+    def install(self):
+        fakes = {
+            "run_blocking": self.run_blocking,
+            "speech_synthesize": self.speech_synthesize,
+            "_split_to_cache": self.split_to_cache,
+            "StreamingSynthesis": self.streaming_synthesis,
+            "get_cache": lambda cache_dir=None: self.cache,
+        }
+        for name, fake in fakes.items():
+            self._saved[name] = getattr(speak_task, name)
+            setattr(speak_task, name, fake)
+
+    def uninstall(self):
+        for name, orig in self._saved.items():
+            setattr(speak_task, name, orig)
+        self._saved.clear()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def stats(self) -> dict:
+        return {"tts_requests": self.requests, "tts_streams": self.streams,
+                "tts_cache_hit_rate": self.cache.stats()["hit_rate"]}
+
+
+# 聊天与图片理解不经过 SpeakTextTask（LLM 边生成边走自己的流式合成 / 只调视觉模型），
+# 仍按耗时模型占用各自的通道
+class SimChatTask(AsyncVoiceTask):
+    """对应 LLMConversationTask：流式，首包延迟后边合成边播"""
+    def __init__(self, world: SimWorld, text: str):
+        super().__init__(name="LLMChat", priority=3, resumable=False)
+        self.world = world
+        self.text = text
+        self.player = None
+
+    async def play(self):
+        w = self.world
+        await asyncio.sleep(w.cost_of(w.cost.llm_first_token_s + w.cost.tts_rtt_s))
+        await asyncio.sleep(w.speech_s(self.text))
+
+
+class SimWeatherTask(WeatherTask):
+    """真实的 WeatherTask，只把天气接口换成按耗时模型计时的假查询"""
+    def __init__(self, world: SimWorld, text: str):
+        super().__init__()
+        self.world = world
+        self.text = text
+
+    async def _query_weather(self) -> str:
+        await asyncio.sleep(self.world.cost_of(self.world.cost.weather_api_s))
+        return self.text
+
+
+class SimImageTask(AsyncVoiceTask):
+    lane = LANE_NETWORK
+
+    def __init__(self, world: SimWorld):
+        super().__init__(name="ImageUnderstand", priority=15, resumable=False)
+        self.world = world
+
+    async def play(self):
+        await asyncio.sleep(self.world.cost_of(self.world.cost.vision_s))
+
+
+# ------------ trace ------------
+def build_tasks(world: SimWorld, event: dict) -> List[AsyncVoiceTask]:
+    """把一条 trace 事件变成要入队的任务（music/stop_music 由 replay 自己处理）"""
+    kind = event["kind"]
+    text = event.get("text", "好的")
+    if kind == "speak":
+        texts = event.get("texts") or [text]
+        return [SpeakTextTask(t, priority=event.get("priority", 10)) for t in texts]
+    if kind == "reminder":
+        return [SpeakTextTask(f"现在是12点00分，提醒您：{text}", priority=REMINDER_PRIORITY,
+                              deadline_s=0, ttl_s=REMINDER_TTL_S)]
+    if kind == "time":
+        return [SpeakTextTask("现在是12点00分。", deadline_s=0, ttl_s=TIME_TTL_S)]
+    if kind == "chat":
+        return [SimChatTask(world, event.get("reply", "这是一个三十字以内的简短回答。"))]
+    if kind == "weather":
+        # 多句：走 SpeakTextTask 的逐句流水线
+        return [SimWeatherTask(world, "今日是：07月18日 08时00分。深圳市当前天气情况：晴，温度：32度，"
+                                      "体感温度：36度，湿度百分之：70。")]
+    if kind == "image":
+        return [SimImageTask(world)]
+    raise ValueError(f"未知的 trace 事件: {kind}")
+
+
+def load_trace(path: Path) -> List[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        events = [json.loads(line) for line in f if line.strip()]
+    return sorted(events, key=lambda e: e["t"])
+
+
+def dump_trace(events: List[dict], path: Path):
+    with open(path, "w", encoding="utf-8") as f:
+        for e in events:
+            f.write(json.dumps(e, ensure_ascii=False) + "\n")
+
+
+class TraceRecorder:
+    """
+    录制真实运行时的入队序列：包装 scheduler.enqueue，把每个任务按名字映射成 trace 事件
+    追加写入 path（JSONL），之后可用 --trace 回放。
+    """
+    KINDS = {"PlayMusic": "music", "LLMChat": "chat", "Weather": "weather",
+             "ImageUnderstand": "image"}
+
+    def __init__(self, scheduler: AudioScheduler, path: Path):
+        self.path = path
+        self.t0 = time.monotonic()
+        self._enqueue = scheduler.enqueue
+        scheduler.enqueue = self._record
+
+    def _record(self, task: AsyncVoiceTask):
+        kind = self.KINDS.get(task.name, "speak")
+        if kind == "speak" and task.priority >= REMINDER_PRIORITY:
+            kind = "reminder"
+        event = {"t": round(time.monotonic() - self.t0, 3), "kind": kind,
+                 "priority": task.priority}
+        if hasattr(task, "text"):
+            event["text"] = task.text
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(event, ensure_ascii=False) + "\n")
+        return self._enqueue(task)
+
+
+def scenario(name: str, seed: int = 0, minutes: float = 30) -> List[dict]:
+    """
+    内置场景（确定性生成）：
+      mixed          背景音乐 + 稀疏提醒 + 聊天/问时间/天气/列提醒
+      reminder_storm 背景音乐 + 大量同时到点的提醒
+      chat_burst     背景音乐 + 密集的连续聊天和图片理解
+    """
+    rng = random.Random(seed)
+    end = minutes * 60
+    events = [{"t": 0.0, "kind": "music"}]
+
+    def poisson(mean_gap: float, kind: str, **extra):
+        t = rng.expovariate(1 / mean_gap)
+        while t < end:
+            events.append({"t": round(t, 3), "kind": kind, **extra})
+            t += rng.expovariate(1 / mean_gap)
+
+    if name == "mixed":
+        poisson(120, "reminder", text="喝水休息一下")
+        poisson(90, "chat")
+        poisson(300, "time")
+        poisson(600, "weather")
+        t = rng.uniform(0, end)
+        events.append({"t": round(t, 3), "kind": "speak",
+                       "texts": [f"第{i}条， 12:{i:02d}, 提醒事项{i}" for i in range(1, 6)]})
+    elif name == "reminder_storm":
+        for m in range(0, int(minutes), 5):
+            for i in range(rng.randint(3, 8)):
+                events.append({"t": m * 60.0, "kind": "reminder", "text": f"事项{i}"})
+        poisson(60, "time")
+    elif name == "chat_burst":
+        t = 0.0
+        while t < end:
+            t += rng.expovariate(1 / 60)
+            for i in range(rng.randint(2, 5)):
+                events.append({"t": round(t + i * 2.5, 3), "kind": "chat"})
+        poisson(180, "image")
+        poisson(240, "reminder", text="站起来活动一下")
+    else:
+        raise ValueError(f"未知场景: {name}")
+    return sorted(events, key=lambda e: e["t"])
+
+
+SCENARIOS = ("mixed", "reminder_storm", "chat_burst")
+
+
+# ------------ 回放与报告 ------------
+async def replay(events: List[dict], seed: int = 0, cost: Optional[CostModel] = None) -> dict:
+    """在虚拟时钟上回放 events，返回报告（需在 run_virtual 中调用）"""
+    world = SimWorld(seed, cost)
+    backend = FakeBackend(world)
+    backend.install()
+    try:
+        return await _replay(events, world, backend)
+    finally:
+        backend.uninstall()
+
+
+async def _replay(events: List[dict], world: SimWorld, backend: FakeBackend) -> dict:
+    loop = asyncio.get_running_loop()
+    player = FakePlayer(backend.durations)
+    scheduler = AudioScheduler(Path("."), player=player)
+    loop_task = asyncio.create_task(scheduler.loop())
+    music: Optional[PlayMusicTask] = None
+    t0 = loop.time()
+
+    for e in events:
+        await asyncio.sleep(max(0.0, t0 + e["t"] - loop.time()))
+        if e["kind"] == "music":
+            music = PlayMusicTask()
+            world.tasks.append(music)
+            scheduler.enqueue(music)
+            continue
+        if e["kind"] == "stop_music":
+            if music is not None:
+                scheduler.cancel_task(music)
+            continue
+        for task in build_tasks(world, e):
+            world.tasks.append(task)
+            if scheduler.enqueue(task) is not task:
+                world.coalesced += 1
+    trace_end = loop.time() - t0
+
+    # 排空：等除背景音乐外的任务都结束（或超时）
+    deadline = loop.time() + DRAIN_S
+    while loop.time() < deadline and _pending(scheduler, music):
+        await asyncio.sleep(1)
+    report = _report(world, scheduler, music, trace_end, loop.time() - t0)
+    report.update(backend.stats())
+    loop_task.cancel()
+    return report
+
+
+def _pending(scheduler: AudioScheduler, music) -> bool:
+    for lane in scheduler.lanes.values():
+        if len(lane.queue) or any(not t._task.done() for t in lane.running):
+            return True
+    return scheduler.running is not None and scheduler.running is not music
+
+
+def _percentile(xs: List[float], q: float) -> Optional[float]:
+    if not xs:
+        return None
+    xs = sorted(xs)
+    return round(xs[min(len(xs) - 1, int(q * len(xs)))], 3)
+
+
+def _inversions(tasks: List[AsyncVoiceTask]) -> int:
+    """
+    优先级反转：同一通道里，y 在 x 出队之前就已入队、优先级比 x 高，却在 x 之后才出队。
+    （抢占、挂起恢复都不会产生这种情况，出现即说明调度顺序有错）
+    """
+    n = 0
+    by_lane: Dict[str, List[AsyncVoiceTask]] = {}
+    for t in tasks:
+        if "dispatched" in t.timing and "enqueued" in t.timing:
+            by_lane.setdefault(t.lane, []).append(t)
+    for lane_tasks in by_lane.values():
+        for x in lane_tasks:
+            dx = x.timing["dispatched"]
+            for y in lane_tasks:
+                if (y.priority > x.priority and y.timing["enqueued"] < dx
+                        and y.timing["dispatched"] > dx):
+                    n += 1
+    return n
+
+
+def _report(world: SimWorld, scheduler: AudioScheduler, music, trace_end: float, total: float) -> dict:
+    tasks = [t for t in world.tasks if t is not music]
+    queued_ids = {id(t) for l in scheduler.lanes.values() for t in l.queue}
+    done = [t for t in tasks if "play_end" in t.timing]
+    aborted = [t for t in tasks if "dispatched" in t.timing and "play_end" not in t.timing
+               and t._task.done()]
+    waiting = [t for t in tasks if "enqueued" in t.timing and "dispatched" not in t.timing]
+    dropped = [t for t in waiting if id(t) not in queued_ids and t.expired()]
+    # 入队了、没出队、没过期、也不在队列里：丢失
+    lost = [t for t in waiting if id(t) not in queued_ids and not t.expired()]
+    e2e: Dict[str, List[float]] = {}
+    wait: Dict[str, List[float]] = {}
+    for t in done:
+        e2e.setdefault(t.name, []).append(t.timing["play_end"] - t.timing["enqueued"])
+        wait.setdefault(t.name, []).append(t.timing["dispatched"] - t.timing["enqueued"])
+    latency = {
+        name: {
+            "n": len(xs),
+            "e2e_p50": _percentile(xs, 0.5),
+            "e2e_p95": _percentile(xs, 0.95),
+            "e2e_p99": _percentile(xs, 0.99),
+            "wait_p95": _percentile(wait[name], 0.95),
+        }
+        for name, xs in sorted(e2e.items())
+    }
+    music_ok = music is None or music._task is None or (
+        not music._task.done() and (scheduler.running is music or not len(scheduler.suspended))
+    )
+    snap = scheduler.metrics_snapshot()
+    return {
+        "trace_s": round(trace_end, 1),
+        "virtual_s": round(total, 1),
+        "tasks": len(tasks),
+        "completed": len(done),
+        "aborted": len(aborted),
+        "dropped_expired": len(dropped),
+        "coalesced": world.coalesced,
+        "still_queued": len(queued_ids),
+        "lost": len(lost),
+        "throughput_per_min": round(len(done) / max(total, 1e-9) * 60, 2),
+        "latency": latency,
+        "preemptions": snap["counters"].get("preemptions", 0),
+        "batched": snap["counters"].get("batched", 0),
+        "priority_inversions": _inversions(tasks),
+        "music_resumed": music_ok,
+        "queue_depth_max": snap["queue_depth_max"],
+        "deadlines": snap["deadlines"],
+    }
+
+
+def run_benchmark(events: List[dict], seed: int = 0, verbose: bool = False) -> dict:
+    wall = time.perf_counter()
+    # 真实任务的逐条日志很多，默认不打印
+    with contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO()):
+        report = run_virtual(replay(events, seed))
+    report["wall_s"] = round(time.perf_counter() - wall, 3)
+    return report
+
+
+def print_report(name: str, r: dict):
+    ok = r["lost"] == 0 and r["priority_inversions"] == 0 and r["music_resumed"]
+    print(f"\n=== {name}: {'OK' if ok else 'FAIL'} ===")
+    print(f"虚拟时长 {r['virtual_s']}s（墙钟 {r['wall_s']}s），任务 {r['tasks']}，"
+          f"完成 {r['completed']}，过期丢弃 {r['dropped_expired']}，合并 {r['coalesced']}，"
+          f"丢失 {r['lost']}，吞吐 {r['throughput_per_min']}/min")
+    print(f"抢占 {r['preemptions']}，合并合成 {r['batched']}，优先级反转 {r['priority_inversions']}，"
+          f"背景音乐恢复 {r['music_resumed']}，最大队列深度 {r['queue_depth_max']}")
+    print(f"TTS 整句请求 {r['tts_requests']}，流式合成 {r['tts_streams']}，"
+          f"TTS 缓存命中率 {r['tts_cache_hit_rate']}")
+    print(f"{'任务':<12}{'n':>5}{'e2e p50':>10}{'p95':>10}{'p99':>10}{'wait p95':>10}")
+    for name, l in r["latency"].items():
+        print(f"{name:<12}{l['n']:>5}{l['e2e_p50']:>10}{l['e2e_p95']:>10}"
+              f"{l['e2e_p99']:>10}{l['wait_p95']:>10}")
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="AudioScheduler 仿真基准")
+    ap.add_argument("--trace", type=Path, help="回放 JSONL trace（默认跑全部内置场景）")
+    ap.add_argument("--scenario", choices=SCENARIOS, action="append")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--minutes", type=float, default=30)
+    ap.add_argument("--dump", type=Path, help="把内置场景的 trace 写到文件后退出")
+    ap.add_argument("--json", type=Path, help="把报告写成 json")
+    ap.add_argument("--verbose", action="store_true", help="打印调度器和任务的日志")
+    args = ap.parse_args(argv)
+
+    if args.trace:
+        runs = {args.trace.name: load_trace(args.trace)}
+    else:
+        runs = {s: scenario(s, args.seed, args.minutes) for s in (args.scenario or SCENARIOS)}
+    if args.dump:
+        dump_trace([e for evs in runs.values() for e in evs], args.dump)
+        return 0
+
+    reports = {}
+    failed = False
+    for name, events in runs.items():
+        r = run_benchmark(events, args.seed, args.verbose)
+        reports[name] = r
+        print_report(name, r)
+        failed |= r["lost"] > 0 or r["priority_inversions"] > 0 or not r["music_resumed"]
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,23 @@
 # speak_task.py
 
 import configparser
+import io
+import re
+from typing import Callable, List, Optional, Union
 
 from pydub import AudioSegment
+from pydub.silence import detect_silence
 
-from voice_assistant.tasks.task_manager4 import AsyncVoiceTask
+from voice_assistant.tasks.task_manager4 import AsyncVoiceTask, _now
+from voice_assistant.tasks.executors import POOL_CPU, POOL_DECODE, POOL_NETWORK, run_blocking
 from voice_assistant.player.mp3_player import MP3Player
-from voice_assistant.utils.tts_utils import speech_synthesize
+from voice_assistant.utils.tts_utils import (
+    STREAM_CHANNELS, STREAM_FORMAT, STREAM_RATE, TTS_FORMAT, TTS_MODEL, TTS_VOICE,
+    StreamingSynthesis, speech_synthesize,
+)
+from voice_assistant.utils.tts_cache import get_cache
+from voice_assistant.tts.concat_tts import FreeText, plan
+from voice_assistant.tts.segmenter import split_sentences
 from voice_assistant.tasks.task_manager4 import AudioScheduler
 
 import asyncio
@@ -17,66 +28,361 @@ from pathlib import Path
 cfg = configparser.ConfigParser()
 cfg.read('/home/hugd/privateprojects/personalvoicehelper/env/config.ini')
 
+# 合并合成时句间停顿的最短长度（ms）；低于此长度的静音不作为切分候选
+MIN_GAP_MS = 120
+# 合并合成切出来的单条片段在 TTS 缓存里的格式
+SEGMENT_FORMAT = STREAM_FORMAT
+# 切出来的片段是按静音猜的边界，单独记在这个 model 名下：只有合并合成会复用，
+# 普通的整句查找（_lookup_cache）永远不会拿到切错的片段
+SPLIT_MODEL = f"{TTS_MODEL}+split"
+# 每段时长与按字数估算的时长之比超出这个范围就认为切错了，整批不入缓存
+SPLIT_RATIO_BAND = (0.5, 2.0)
+# 长文本逐句播放时，正在播第 N 句的同时提前准备后面几句
+PIPELINE_AHEAD = 1
+
+
+def _join_texts(texts: List[str]) -> str:
+    """拼接多条播报，缺句末标点的补一个句号，保证句间有明显停顿"""
+    parts = []
+    for t in texts:
+        t = t.strip()
+        if not re.search(r"[。！？!?.]$", t):
+            t += "。"
+        parts.append(t)
+    return "".join(parts)
+
+
+def _split_points(seg: AudioSegment, texts: List[str]) -> Optional[List[int]]:
+    """
+    在合并合成的音频里找 len(texts)-1 个切分点（ms）：
+    按字数比例估算每个边界的位置，在附近的静音段里挑“长且近”的一段取中点。
+    找不到足够的静音段时返回 None。
+    """
+    gaps = detect_silence(seg, min_silence_len=MIN_GAP_MS, silence_thresh=seg.dBFS - 16)
+    if len(gaps) < len(texts) - 1:
+        return None
+    total_chars = sum(len(t) for t in texts)
+    points: List[int] = []
+    chars = 0
+    last = 0
+    for t in texts[:-1]:
+        chars += len(t)
+        expected = len(seg) * chars / total_chars
+        cands = [(b - a) - 0.5 * abs((a + b) / 2 - expected)
+                 for a, b in gaps if (a + b) // 2 > last]
+        if not cands:
+            return None
+        start = len(gaps) - len(cands)
+        best = start + max(range(len(cands)), key=cands.__getitem__)
+        a, b = gaps[best]
+        last = (a + b) // 2
+        points.append(last)
+    return points
+
+
+def _split_to_cache(mp3_path: Path, texts: List[str]) -> Optional[List[Path]]:
+    """
+    把合并合成的 mp3 按播报切开，每段以各自的文字为 key 存进 TTS 缓存（wav，SPLIT_MODEL 名下），
+    返回各段路径；切分失败或校验不通过时返回 None
+    """
+    seg = AudioSegment.from_file(mp3_path)
+    points = _split_points(seg, texts)
+    if points is None:
+        return None
+    bounds = [0] + points + [len(seg)]
+    if len(bounds) - 1 != len(texts):
+        return None
+    total_chars = sum(len(t) for t in texts)
+    lo, hi = SPLIT_RATIO_BAND
+    for i, text in enumerate(texts):
+        expected = len(seg) * len(text) / total_chars
+        if not lo <= (bounds[i + 1] - bounds[i]) / expected <= hi:
+            print(f"[SpeakTextTask] 第 {i + 1} 段时长与估算不符，放弃切分: {text[:20]!r}")
+            return None
+    cache = get_cache()
+    paths = []
+    for i, text in enumerate(texts):
+        buf = io.BytesIO()
+        seg[bounds[i]:bounds[i + 1]].export(buf, format=SEGMENT_FORMAT)
+        paths.append(cache.put(text, SPLIT_MODEL, TTS_VOICE, SEGMENT_FORMAT, buf.getvalue()))
+    return paths
+
+
 class SpeakTextTask(AsyncVoiceTask):
     """
     通用播报任务：
-      - text: 需要播报的文字
+      - text: 需要播报的文字；也可以是返回文字的函数（如“现在是X点X分”），
+              在合成和真正开口前各取一次，保证播报的是开口时的内容
       - priority: 优先级（> background music）
       - resumable: False（完成后不自己恢复）
+      - deadline_s / ttl_s: 见 AsyncVoiceTask
+    音频来源依次为：预合成回复 → 模板拼接 → TTS 缓存 → 流式合成（边收边播，收齐后写入缓存）。
+    多句的长文本（天气播报等）按句切开，每句各自走上面的流程、各自缓存，
+    播第 N 句时提前合成后面 PIPELINE_AHEAD 句。
+    播完与否以输出端的播放结束回调为准，不再按文件时长 sleep。
     """
     def __init__(
         self,
-        text: str,
+        text: Union[str, Callable[[], str]],
         *,
         priority: int = 10,
-        resumable: bool = False
+        resumable: bool = False,
+        deadline_s: Optional[float] = None,
+        ttl_s: Optional[float] = None,
     ):
-        super().__init__(name="SpeakText", priority=priority, resumable=resumable)
-        self.text = text
+        super().__init__(
+            name="SpeakText", priority=priority, resumable=resumable,
+            deadline_s=deadline_s, ttl_s=ttl_s,
+        )
+        self._render = text if callable(text) else None
+        self.text = text() if callable(text) else text
         self.player: MP3Player | None = None
         # 记录入队时背景是否在播放
         self._was_playing: bool = False
+        # prepare() 合成出的 mp3
+        self._mp3_path: Path | None = None
+        # 由调度器注入；命中预合成回复时不再请求网络
+        self.phrase_bank = None
+        # 由调度器注入；报时/日期/提醒这类模板句在本地拼接成 PCM，不再整句合成
+        self.concat_tts = None
+        self._pcm: Optional[bytes] = None
+        # 缓存未命中时 prepare() 发起的流式合成；play() 边收边播
+        self._stream: Optional[StreamingSynthesis] = None
+        self._stream_job: Optional[asyncio.Future] = None
+        # 长文本切出的逐句子任务（只在本任务内部使用，不进调度队列）
+        self._parts: List["SpeakTextTask"] = []
+
+    def coalesce_key(self):
+        # 同优先级、同文本的播报在队列里只保留一条
+        return (self.name, self.text, self.priority)
+
+    def batch_key(self):
+        # 相邻的同优先级播报（如“列出提醒”的多条）合并成一次合成；多句长文本自己逐句流水线，不参与合并
+        if len(split_sentences(self.text)) > 1:
+            return None
+        return (self.name, self.priority)
+
+    @classmethod
+    async def prepare_batch(cls, tasks: List["SpeakTextTask"]):
+        """
+        合并合成：一次 speech_synthesize 拿到整段音频，再按句间静音切回每条播报
+        各自的片段（wav，存在 SPLIT_MODEL 名下），每个任务仍独立播放、可单独取消。
+        各条都已有缓存片段时不再请求；合成或切分失败时退回逐条合成。
+        """
+        for t in tasks:
+            t._refresh_text()
+        # 预合成库里有的、能拼接的直接用，剩下的再合并合成
+        tasks = [t for t in tasks if not t._lookup_bank() and not await t._render_concat()]
+        if not tasks:
+            return
+        texts = [t.text for t in tasks]
+        cache = get_cache()
+        # 整句缓存优先，其次是之前合并合成切出来的片段
+        paths = [cache.get_any(text, TTS_MODEL, TTS_VOICE, (STREAM_FORMAT, TTS_FORMAT))
+                 or cache.get(text, SPLIT_MODEL, TTS_VOICE, SEGMENT_FORMAT) for text in texts]
+        if not all(paths):
+            try:
+                mp3_path = await run_blocking(POOL_NETWORK, speech_synthesize, _join_texts(texts))
+                paths = await run_blocking(POOL_DECODE, _split_to_cache, mp3_path, texts)
+                reason = "合并音频切分失败"
+            except Exception as e:
+                # 合并后的长文本合成失败（超长、接口报错等）不连累各条播报
+                paths, reason = None, f"合并合成失败（{e}）"
+            if paths is None:
+                print(f"[SpeakTextTask] {reason}，逐条合成 {len(tasks)} 条")
+                for t in tasks:
+                    await t.prepare()
+                return
+        for t, p in zip(tasks, paths):
+            t._mp3_path = p
+            t._pcm = None
+        print(f"[SpeakTextTask] 合并合成完毕：{len(tasks)} 条")
+
+    def _refresh_text(self) -> bool:
+        """重新生成动态文字，返回是否有变化"""
+        if self._render is None:
+            return False
+        text = self._render()
+        changed = text != self.text
+        self.text = text
+        return changed
+
+    def _lookup_bank(self) -> bool:
+        """在预合成库里找当前文字，命中时直接用库里的 mp3（PCM 已解码好）"""
+        entry = self.phrase_bank.lookup(self.text) if self.phrase_bank else None
+        if entry is None:
+            return False
+        self._mp3_path = Path(entry["mp3"])
+        self._pcm = None
+        print(f"[SpeakTextTask] 命中预合成回复：{self.text!r}")
+        return True
+
+    async def _render_concat(self) -> bool:
+        """模板句用片段拼接成 PCM；不是模板或片段不全时返回 False"""
+        pieces = plan(self.text) if self.concat_tts else None
+        if pieces is None:
+            return False
+        # 带自由文字（提醒内容）的要请求 TTS，放 network 池；纯片段拼接只是本地计算
+        pool = POOL_NETWORK if any(isinstance(p, FreeText) for p in pieces) else POOL_CPU
+        pcm = await run_blocking(pool, self.concat_tts.render, pieces)
+        if pcm is None:
+            return False
+        self._pcm = pcm
+        self._mp3_path = None
+        print(f"[SpeakTextTask] 拼接合成完毕：{self.text!r}")
+        return True
+
+    def _lookup_cache(self) -> bool:
+        """TTS 缓存里已有整句（流式合成 / 合并合成的 wav，或旧的 mp3）时直接播放文件"""
+        path = get_cache().get_any(self.text, TTS_MODEL, TTS_VOICE, (STREAM_FORMAT, TTS_FORMAT))
+        if path is None:
+            return False
+        self._mp3_path = path
+        self._pcm = None
+        return True
+
+    def _stop_stream(self):
+        if self._stream is not None:
+            self._stream.cancel()
+        self._stream = None
+        self._stream_job = None
+        for part in self._parts:
+            part._stop_stream()
 
-    async def execute(self):
-        # 1) 记录并中断背景播放
+    @property
+    def _ready(self) -> bool:
+        """prepare() 已经确定了音频来源"""
+        return bool(self._parts) or any(x is not None for x in (self._mp3_path, self._pcm, self._stream))
+
+    def _part(self, text: str) -> "SpeakTextTask":
+        part = SpeakTextTask(text, priority=self.priority)
+        part.player = self.player
+        part.phrase_bank = self.phrase_bank
+        part.concat_tts = self.concat_tts
+        return part
+
+    async def prepare(self):
+        # 排队期间就会被调度器提前执行；未命中任何缓存时只发起流式合成、不等它结束，
+        # 分片在后台攒着，轮到播放时先补上已到的部分
+        self._refresh_text()
+        self._stop_stream()
+        self._parts = []
+        if self._lookup_bank() or await self._render_concat() or self._lookup_cache():
+            return
+        self._pcm = None
+        self._mp3_path = None
+        sentences = split_sentences(self.text)
+        if len(sentences) > 1:
+            # 长文本：先只准备开头几句，其余在播放时流水线准备
+            self._parts = [self._part(s) for s in sentences]
+            for part in self._parts[:PIPELINE_AHEAD + 1]:
+                await part.prepare()
+            print(f"[SpeakTextTask] 长文本分 {len(sentences)} 句播放")
+            return
+        self._stream = StreamingSynthesis(self.text)
+        self._stream_job = asyncio.ensure_future(run_blocking(POOL_NETWORK, self._stream.run))
+
+    @staticmethod
+    def _done_future():
+        """返回 (future, on_done)：on_done 由输出线程在播放结束时调用，完成 future"""
+        loop = asyncio.get_running_loop()
+        done = loop.create_future()
+
+        def _on_done(_playback):
+            loop.call_soon_threadsafe(lambda: done.done() or done.set_result(None))
+
+        return done, _on_done
+
+    async def _play_and_wait(self, start: Callable[[Callable], None]):
+        """start(on_done) 开始播放；等到输出端报告播完"""
+        done, on_done = self._done_future()
+        start(on_done)
+        await done
+
+    async def _play_stream(self):
+        done, _on_done = self._done_future()
+        source = self.player.open_stream(
+            rate=STREAM_RATE, channels=STREAM_CHANNELS, name="SpeakText", on_done=_on_done
+        )
+        # 分片由合成回调直接写进输出，不再占一个线程搬运；没收到任何分片时 source 被关掉，done 随即完成
+        stream = self._stream
+        stream.attach(source, on_first=lambda: self.timing.setdefault("first_audio", _now()))
+        try:
+            await done
+        except asyncio.CancelledError:
+            source.close()
+            self._stop_stream()
+            raise
+        if stream.received:
+            return
+        # 流式合成失败：退回整句合成成文件再播
+        print(f"[SpeakTextTask] 流式合成失败（{stream.error}），改为整句合成")
+        self._stop_stream()
+        self._mp3_path = await run_blocking(POOL_NETWORK, speech_synthesize, self.text)
+        await self._play_file()
+
+    async def _play_file(self):
+        await self._play_and_wait(lambda on_done: self.player.play_file(
+            was_playing=self._was_playing,
+            path=self._mp3_path,
+            resume_playlist=True,
+            on_done=on_done,
+        ))
+
+    async def play(self):
+        # 1) 记录背景播放状态
         if self.player is None:
             raise RuntimeError("播放器未注入")
         self._was_playing = bool(
             self.player.play_obj and self.player.play_obj.is_playing()
         )
         print(f"[SpeakTextTask] mp3播放器是否在播放：{self._was_playing}")
-        # 2) 合成文字为 MP3（阻塞操作放 executor）
-        loop = asyncio.get_running_loop()
-        mp3_path: Path = await loop.run_in_executor(
-            None,
-            speech_synthesize,
-            self.text
-        )
-        print(f"[SpeakTextTask] 合成完毕：{mp3_path.name}")
+        # 排队期间文字变了（比如跨了一分钟）：按开口时的内容重新合成
+        if self._refresh_text():
+            await self.prepare()
 
-        # 3) 播放并恢复背景（内部会暂停）
-        # 小延迟让 player 准备好
-        await asyncio.sleep(0.05)
+        # 2) 叠加播放（背景歌单由混音器自动压低，不再暂停/重启），等输出端报告播完
         print(f"[SpeakTextTask] 播报：{self.text!r}")
-        # add 20250719
-        if self._was_playing:
-            self.player.pause()
-            print(f"[SpeakTextTask] player.pause()")
+        if self._parts:
+            await self._play_parts()
+        elif self._stream is not None:
+            await self._play_stream()
+        elif self._pcm is not None:
+            self.timing["first_audio"] = _now()
+            await self._play_and_wait(
+                lambda on_done: self.player.play_pcm(self._pcm, name="concat", on_done=on_done)
+            )
+        else:
+            self.timing["first_audio"] = _now()
+            await self._play_file()
+        print("[SpeakTextTask] 播报完成")
 
-        self.player.play_file(
-            was_playing=self._was_playing,
-            path=mp3_path,
-            resume_playlist=True
-        )
+    async def _play_parts(self):
+        """逐句播放；播第 i 句前先发起第 i+1..i+PIPELINE_AHEAD 句的准备，合成与播放重叠"""
+        jobs: dict = {}
 
-        # <—— 新增：根据文件时长同步等待
-        seg = await asyncio.get_running_loop().run_in_executor(
-            None, AudioSegment.from_file, mp3_path
-        )
-        duration_s = seg.duration_seconds
-        # 多留一点缓冲
-        await asyncio.sleep(duration_s + 0.1)
-        print("[SpeakTextTask] 播报完成")
+        def _ahead(j: int):
+            if j < len(self._parts) and j not in jobs and not self._parts[j]._ready:
+                jobs[j] = asyncio.ensure_future(self._parts[j].prepare())
+
+        try:
+            for i, part in enumerate(self._parts):
+                for j in range(i, i + PIPELINE_AHEAD + 1):
+                    _ahead(j)
+                if i in jobs:
+                    await jobs[i]
+                await part.play()
+                if "first_audio" not in self.timing and "first_audio" in part.timing:
+                    self.timing["first_audio"] = part.timing["first_audio"]
+        finally:
+            for job in jobs.values():
+                job.cancel()
+            self._stop_stream()
+
+    async def cancel(self):
+        # 排队中被取消时，已发起的流式合成也一并打断
+        self._stop_stream()
+        await super().cancel()
 
 
 async def main():
@@ -1,25 +1,153 @@
-import asyncio, heapq, time
-from typing import Optional
+import asyncio, time
+from collections import deque
+from typing import Dict, List, Optional
 from voice_assistant.player.mp3_player import  MP3Player
+from voice_assistant.player.pcm_cache import PCMCache
+from voice_assistant.player.library import MusicLibrary
+from voice_assistant.tts.phrase_bank import PhraseBank
+from voice_assistant.tts.concat_tts import ConcatRenderer
+from voice_assistant.player.playlist import Playlist
+from voice_assistant.tasks.task_queue import TaskQueue
+from voice_assistant.tasks.metrics import SchedulerMetrics
+from voice_assistant.tasks.executors import POOL_NETWORK, executor_stats, run_blocking
+from voice_assistant.utils.tts_cache import cache_stats
 from pathlib import Path
-from typing import List, Optional
+
+# 英语听力素材：进歌单索引但不参与顺序播放，只用于“播放 education”之类的点播
+ENGLISH_DIR = Path(__file__).resolve().parents[1] / "englishresource"
+
+# 资源通道：任务只在自己争用的资源上串行
+LANE_SPEAKER = "speaker"   # 出声的任务，同一时间一个，支持抢占
+LANE_NETWORK = "network"   # 只走网络、不出声（如图片理解结果推到 WebUI）
+LANE_COMPUTE = "compute"   # 本地计算
+LANE_LIMITS = {LANE_SPEAKER: 1, LANE_NETWORK: 4, LANE_COMPUTE: 2}
+# 排队中的任务最多提前 prepare 几个、同时最多几个在 prepare
+PREPARE_AHEAD = 4
+PREPARE_CONCURRENCY = 2
+# 相邻的同类任务最多几个合并成一次 prepare_batch()
+BATCH_MAX = 8
+# lateness 统计保留最近多少次
+LATENESS_WINDOW = 200
+# 调度本身的开销（事件循环切换、prepare 收尾等）在这个范围内不算迟到，deadline_s=0 也不会次次报警
+LATE_TOLERANCE_S = 0.05
+# 指标推送到 WebUI 的最小间隔（秒）
+METRICS_PUSH_MIN_S = 2.0
+
+
+def _now() -> float:
+    """
+    调度用的时钟：正在运行的事件循环的 time()（默认就是 time.monotonic()，
+    仿真时是虚拟时钟，见 simulation.py）；不在事件循环里（如提醒线程）时退回 time.monotonic()
+    """
+    try:
+        return asyncio.get_running_loop().time()
+    except RuntimeError:
+        return time.monotonic()
 
 # from voice_assistant.tasks.base import AsyncVoiceTask
 class AsyncVoiceTask:
-    def __init__(self, name: str, priority: int = 1, resumable: bool = True):
+    # True 表示被抢占时无需暂停：由混音器压低音量后继续在背景播放
+    duckable: bool = False
+    # 任务占用的资源通道，见 LANE_LIMITS
+    lane: str = LANE_SPEAKER
+
+    def __init__(
+        self,
+        name: str,
+        priority: int = 1,
+        resumable: bool = True,
+        *,
+        deadline_s: Optional[float] = None,
+        ttl_s: Optional[float] = None,
+    ):
         self.name = name
         self.priority = priority
         self.resumable = resumable
+        # 截止/过期时间（_now()，由创建时的相对秒数换算）：
+        #   deadline - 希望在此之前开始播放，同优先级内越早越先出队，晚了记入 lateness
+        #   expires_at - 过了这个时间还没开始就不再执行（如两分钟前问的“现在几点”）
+        now = _now()
+        self.created_at = now
+        self.deadline: Optional[float] = None if deadline_s is None else now + deadline_s
+        self.expires_at: Optional[float] = None if ttl_s is None else now + ttl_s
+        # 挂起/恢复：_paused_event 置位表示被挂起，_resumed_event 与之相反；
+        # 任务用 wait_suspended()/wait_resumed() 等待状态变化，不需要轮询
         self._paused_event = asyncio.Event()
+        self._resumed_event = asyncio.Event()
+        self._resumed_event.set()
         self._cancel_event = asyncio.Event()
         self._task: Optional[asyncio.Task] = None
+        self._prepare_task: Optional[asyncio.Task] = None
+        # 各阶段时间戳（_now()）：enqueued / dispatched / prepare_start / prepare_end /
+        # play_start / first_audio（可选，真正出声）/ play_end，结束时由调度器汇总进 SchedulerMetrics
+        self.timing: Dict[str, float] = {}
 
-    async def execute(self):
+    async def prepare(self):
+        """
+        第一阶段：不占用扬声器的准备工作（查询接口、合成语音等）。
+        调度器会在任务排队时提前、并发地执行它。默认无事可做。
+        """
+
+    async def play(self):
+        """第二阶段：真正出声的部分，在 speaker 通道上串行执行"""
         raise NotImplementedError
 
+    async def execute(self):
+        # 两阶段任务只需实现 prepare()/play()；老任务直接覆盖 execute()
+        await self.play()
+
+    def ensure_prepared(self, sem: Optional[asyncio.Semaphore] = None) -> asyncio.Task:
+        """启动（仅一次）prepare()，返回对应的 asyncio.Task"""
+        if self._prepare_task is None:
+            async def _prepare():
+                if sem is None:
+                    await self._timed_prepare()
+                    return
+                async with sem:
+                    await self._timed_prepare()
+            self._prepare_task = asyncio.create_task(_prepare())
+        return self._prepare_task
+
+    async def _timed_prepare(self):
+        self.timing["prepare_start"] = _now()
+        await self.prepare()
+        self.timing["prepare_end"] = _now()
+
+    def expired(self, now: Optional[float] = None) -> bool:
+        return self.expires_at is not None and (now or _now()) > self.expires_at
+
+    @property
+    def prepared(self) -> bool:
+        return self._prepare_task is not None and self._prepare_task.done()
+
+    def coalesce_key(self):
+        """
+        返回非 None 时，队列里 key 相同的待执行任务只保留一个
+        （例如十条一模一样的提醒播报）。默认不合并。
+        """
+        return None
+
+    def batch_key(self):
+        """
+        返回非 None 时，队列中相邻、key 相同且尚未 prepare 的任务会合并成一次
+        prepare_batch() 调用（例如连续几条提醒只合成一次）；任务本身仍各自排队、
+        各自 play()，可以单独取消。默认不合并。
+        """
+        return None
+
+    @classmethod
+    async def prepare_batch(cls, tasks: List["AsyncVoiceTask"]):
+        """一次完成 tasks 的 prepare()；默认逐个执行"""
+        for t in tasks:
+            await t.prepare()
+
     async def run(self):
         try:
+            # 排队时已提前 prepare 的任务这里直接拿到结果
+            await self.ensure_prepared()
+            self.timing["play_start"] = _now()
             await self.execute()
+            self.timing["play_end"] = _now()
         except asyncio.CancelledError:
             pass
 
@@ -30,58 +158,242 @@ class AsyncVoiceTask:
 
     async def pause(self):
         self._paused_event.set()
+        self._resumed_event.clear()
 
     async def resume(self):
         self._paused_event.clear()
+        self._resumed_event.set()
+
+    @property
+    def suspended(self) -> bool:
+        return self._paused_event.is_set()
+
+    async def wait_suspended(self):
+        """阻塞到被 pause()（已挂起则立即返回）"""
+        await self._paused_event.wait()
+
+    async def wait_resumed(self):
+        """阻塞到被 resume()（未挂起则立即返回）；长任务可在分段之间调用，作为挂起点"""
+        await self._resumed_event.wait()
 
     async def cancel(self):
         self._cancel_event.set()
+        if self._prepare_task:
+            self._prepare_task.cancel()
         if self._task:
             self._task.cancel()
 
+class Lane:
+    """一个资源通道：独立的优先队列 + 并发上限"""
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        self.queue = TaskQueue()
+        self.running: List[AsyncVoiceTask] = []
+
+
 class AudioScheduler:
-    def __init__(self, mp3_dir: Path, loop_playlist: bool = True, ws_client = None):
+    def __init__(self, mp3_dir: Path, loop_playlist: bool = True, ws_client = None, *, player=None):
 
-        files = sorted(mp3_dir.glob("*.mp3"))
-        if not files:
-            raise FileNotFoundError(f"No mp3 under {mp3_dir}")
         # add ws_client
         self.ws_client = ws_client
 
-        self.audio_player = MP3Player(
-            files,
-            loop=loop_playlist,
-            vol_db = 0,
-            ws_client=self.ws_client
-        )
+        if player is not None:
+            # 外部注入播放器（仿真/基准测试用，见 simulation.py），不碰声卡和曲库
+            self.pcm_cache = None
+            self.library = None
+            self.phrase_bank = None
+            self.concat_tts = None
+            self.audio_player = player
+        else:
+            # 离线导入过的曲目直接 mmap 播放（见 library.py）
+            self.pcm_cache = PCMCache()
+            self.library = MusicLibrary(self.pcm_cache)
+            # 常用回复的预合成库（见 phrase_bank.py），启动时后台补齐今明两天要用的条目
+            self.phrase_bank = PhraseBank(self.pcm_cache)
+            self.phrase_bank.warm_up(self.phrase_bank.startup_phrases())
+            # 报时/日期/提醒句的拼接合成（见 concat_tts.py），片段同样后台补齐
+            self.concat_tts = ConcatRenderer(self.pcm_cache)
+            self.concat_tts.warm_up()
+            # 歌单索引：启动时直接读索引，目录变化时后台增量刷新；英语素材只用于点播
+            files = Playlist([mp3_dir], extra_dirs=[ENGLISH_DIR], library=self.library)
+            if not len(files):
+                raise FileNotFoundError(f"No mp3 under {mp3_dir}")
+
+            self.audio_player = MP3Player(
+                files,
+                loop=loop_playlist,
+                vol_db = 0,
+                ws_client=self.ws_client,
+                pcm_cache=self.pcm_cache,
+                library=self.library
+            )
 
+        # 各资源通道；speaker 通道沿用 running/paused_stack 的抢占逻辑，其余通道按并发上限并行
+        self.lanes = {name: Lane(name, limit) for name, limit in LANE_LIMITS.items()}
         self.running: Optional[AsyncVoiceTask] = None
         self.paused_stack: List[AsyncVoiceTask] = []
-        self.queue: List[tuple[int, int, AsyncVoiceTask]] = []
-        # 同优先级任务排序
-        self._counter = 0
+        # 被抢占的任务：挂起（可混音的只压低音量）后放这里，speaker 空闲时按优先级恢复
+        self.suspended = TaskQueue(coalesce=False)
+        # 可寻址优先队列：O(log n) 取消/改优先级，重复任务合并
+        self.queue = self.lanes[LANE_SPEAKER].queue
+        # 事件驱动：入队/取消/暂停/任务结束时才唤醒 loop，空闲时不占 CPU
+        self._wakeup = asyncio.Event()
+        # loop() 运行所在的事件循环，供 enqueue_threadsafe 使用
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # 排队任务的 prepare() 并发上限
+        self._prepare_sem = asyncio.Semaphore(PREPARE_CONCURRENCY)
+        # 截止时间统计：最近若干次开始时相对 deadline 的延迟（秒，负数为提前）、过期丢弃数
+        self.lateness: deque = deque(maxlen=LATENESS_WINDOW)
+        # 排队/prepare/play 耗时、抢占次数、队列深度，见 metrics_snapshot()
+        self.metrics = SchedulerMetrics()
+        self._metrics_pushed_at = 0.0
+        # 节流窗口内被跳过的推送：窗口结束时补推一次，最后的状态不会丢
+        self._metrics_trailing: Optional[asyncio.TimerHandle] = None
+
+    def _notify(self, *_):
+        self._wakeup.set()
+
+    def _start(self, task: AsyncVoiceTask):
+        if task.deadline is not None:
+            late = _now() - task.deadline
+            self.lateness.append(late)
+            if late > LATE_TOLERANCE_S:
+                print(f"[Scheduler] {task.name} 晚于截止时间 {late:.2f}s 开始")
+        task.timing["dispatched"] = _now()
+        # 任务结束（含被取消）时通过 done-callback 记指标并唤醒调度循环
+        task.start().add_done_callback(lambda fut: self._on_task_done(task, fut))
+
+    def _on_task_done(self, task: AsyncVoiceTask, fut: asyncio.Future):
+        # run() 吞掉了 CancelledError，以是否走到 play_end 判断是否播完
+        completed = not fut.cancelled() and "play_end" in task.timing
+        self.metrics.task_done(task.name, task.timing, completed)
+        self._push_metrics()
+        self._notify()
+
+    def _peek_live(self, queue: TaskQueue) -> Optional[AsyncVoiceTask]:
+        """队首第一个未过期的任务（不出队）；排在它前面的过期任务直接丢弃（连同已开始的 prepare）"""
+        now = _now()
+        while queue:
+            task = queue.peek()
+            if not task.expired(now):
+                return task
+            queue.pop()
+            if task._prepare_task:
+                task._prepare_task.cancel()
+            self.metrics.incr("dropped_expired")
+            print(f"[Scheduler] 丢弃过期任务: {task.name}")
+        return None
 
+    def deadline_report(self) -> dict:
+        """截止时间统计：开始次数、迟到次数（超出 LATE_TOLERANCE_S）、延迟分位数（秒）、过期丢弃数"""
+        xs = sorted(self.lateness)
 
-    def enqueue(self, task: AsyncVoiceTask):
+        def pick(q):
+            return round(xs[min(len(xs) - 1, int(q * len(xs)))], 3) if xs else None
+
+        return {
+            "started": len(xs),
+            "late": sum(1 for x in xs if x > LATE_TOLERANCE_S),
+            "p50": pick(0.5),
+            "p95": pick(0.95),
+            "max": round(xs[-1], 3) if xs else None,
+            "dropped_expired": self.metrics.counters["dropped_expired"],
+        }
+
+    def metrics_snapshot(self) -> dict:
+        """调度器全部指标（可直接 json 序列化），WebUI / 调试接口使用"""
+        snap = self.metrics.snapshot()
+        snap["deadlines"] = self.deadline_report()
+        snap["suspended"] = len(self.suspended)
+        snap["running"] = self.running.name if self.running else None
+        snap["executors"] = executor_stats()
+        snap["tts_cache"] = cache_stats()
+        snap["phrase_bank"] = self.phrase_bank.stats() if self.phrase_bank else None
+        snap["concat_tts"] = self.concat_tts.stats() if self.concat_tts else None
+        return snap
+
+    def _push_metrics(self, force: bool = False):
+        # 有任务结束时推送，最多每 METRICS_PUSH_MIN_S 秒一次；窗口内的推送合并到窗口结束时
+        if self.ws_client is None or not hasattr(self.ws_client, "send_metrics"):
+            return
+        now = _now()
+        wait = self._metrics_pushed_at + METRICS_PUSH_MIN_S - now
+        if not force and wait > 0:
+            if self._metrics_trailing is None:
+                self._metrics_trailing = asyncio.get_running_loop().call_later(wait, self._push_metrics, True)
+            return
+        if self._metrics_trailing is not None:
+            self._metrics_trailing.cancel()
+            self._metrics_trailing = None
+        self._metrics_pushed_at = now
+        # socket.io 的 emit 是同步网络调用，放到 network 池里，不卡调度循环
+        asyncio.ensure_future(run_blocking(POOL_NETWORK, self.ws_client.send_metrics, self.metrics_snapshot()))
+
+    def _live_music(self) -> Optional["PlayMusicTask"]:
+        """正在播放、被挂起或排队中的音乐任务（还没结束的）"""
+        for task in [self.running, *self.suspended, *self.queue]:
+            if isinstance(task, PlayMusicTask) and not (task._task and task._task.done()):
+                return task
+        return None
+
+    def enqueue(self, task: AsyncVoiceTask) -> AsyncVoiceTask:
+        # 已有音乐任务：再次“播放 xx”交给它切歌。同优先级的新任务抢占不了它，
+        # 挂起的那个又总是先恢复，新建的任务永远轮不到
+        if isinstance(task, PlayMusicTask):
+            music = self._live_music()
+            if music is not None:
+                music.request(task.query)
+                return music
         # 注入同一个播放器
         if hasattr(task, 'player'):
             task.player = self.audio_player
-        # 每次入队都增加 counter，保证即使优先级相同也能通过 counter 排序
-        self._counter += 1
-        heapq.heappush(self.queue, (-task.priority, self._counter, task))
+        if hasattr(task, 'phrase_bank'):
+            task.phrase_bank = self.phrase_bank
+        if hasattr(task, 'concat_tts'):
+            task.concat_tts = self.concat_tts
+        # 同优先级按入队顺序；与排队中任务重复时返回已有的那个
+        queued = self._lane_of(task).queue.push(task)
+        if queued is not task:
+            print(f"[Scheduler] 合并重复任务: {task.name}")
+            self.metrics.incr("coalesced")
+            return queued
+        task.timing["enqueued"] = _now()
+        self._notify()
+        return task
+
+    def enqueue_threadsafe(self, task: AsyncVoiceTask):
+        """给其它线程（如提醒的 schedule 线程）用：切回调度循环所在线程再入队"""
+        if self._loop is None:
+            self.enqueue(task)
+            return
+        self._loop.call_soon_threadsafe(self.enqueue, task)
+
+    def _lane_of(self, task: AsyncVoiceTask) -> Lane:
+        return self.lanes.get(task.lane, self.lanes[LANE_SPEAKER])
 
     def cancel_task(self, task: AsyncVoiceTask):
+        lane = self._lane_of(task)
         # 1) 如果是正在运行的任务
         if self.running is task:
             asyncio.create_task(task.cancel())
             self.running = None
-        # 2) 如果在队列里，删掉它
+        elif task in lane.running:
+            asyncio.create_task(task.cancel())
+        elif self.suspended.remove(task):
+            asyncio.create_task(task.cancel())
+        # 2) 如果在队列里，惰性删除（已开始的 prepare 一并取消）
         else:
-            # 重建队列，过滤掉要取消的 task
-            self.queue = [
-                (pri, cnt, t) for (pri, cnt, t) in self.queue if t is not task
-            ]
-            heapq.heapify(self.queue)
+            lane.queue.remove(task)
+            if task._prepare_task:
+                task._prepare_task.cancel()
+        self._notify()
+
+    def bump_priority(self, task: AsyncVoiceTask, priority: int):
+        """调整任务优先级；排队中的任务会按新优先级重新排序，可能触发抢占"""
+        if not self._lane_of(task).queue.reprioritize(task, priority):
+            task.priority = priority
+        self._notify()
 
     def pause_music(self):
         """直接暂停背景歌单"""
@@ -111,63 +423,183 @@ class AudioScheduler:
             if self.running.resumable:
                 self.paused_stack.append(self.running)
             self.running = None
-
+            self._notify()
 
     async def loop(self):
+        self._loop = asyncio.get_running_loop()
         while True:
-            # 1) idle 时启动下一个任务
-            if self.running is None and self.queue:
-                _,_, nxt = heapq.heappop(self.queue)
-                nxt.start()
+            # 先 clear 再调度：调度过程中到来的通知不会丢
+            self._wakeup.clear()
+            await self._dispatch()
+            await self._wakeup.wait()
+
+    async def _dispatch(self):
+        # 先分组 prepare，再出队：idle 时连续入队的几条播报也能合并成一次合成
+        self._prepare_ahead()
+        await self._dispatch_speaker()
+        for lane in self.lanes.values():
+            if lane.name != LANE_SPEAKER:
+                self._dispatch_lane(lane)
+        self._prepare_ahead()
+        for lane in self.lanes.values():
+            self.metrics.sample_depth(lane.name, len(lane.queue))
+
+    def _prepare_ahead(self):
+        # speaker 通道排在前面的任务提前 prepare：合成等网络操作与当前播放重叠，
+        # 轮到它时只剩 play()。相邻且 batch_key 相同的任务合并为一组，一组算一个名额
+        units = 0
+        group: List[AsyncVoiceTask] = []
+        for task in self.queue.head(PREPARE_AHEAD + BATCH_MAX):
+            if task.expired():
+                continue
+            key = task.batch_key() if task._prepare_task is None else None
+            if group and key is not None and key == group[0].batch_key() and len(group) < BATCH_MAX:
+                group.append(task)
+                continue
+            if group:
+                self._prepare_group(group)
+                units += 1
+                group = []
+            if units >= PREPARE_AHEAD:
+                return
+            if key is not None:
+                group = [task]
+            else:
+                task.ensure_prepared(self._prepare_sem)
+                units += 1
+        if group and units < PREPARE_AHEAD:
+            self._prepare_group(group)
+
+    def _prepare_group(self, group: List[AsyncVoiceTask]):
+        if len(group) == 1:
+            group[0].ensure_prepared(self._prepare_sem)
+            return
+        print(f"[Scheduler] 合并 prepare: {len(group)} 个 {group[0].name}")
+        self.metrics.incr("batched", len(group))
+
+        async def _batch():
+            async with self._prepare_sem:
+                await type(group[0]).prepare_batch(group)
+
+        shared = asyncio.create_task(_batch())
+
+        async def _member(task: AsyncVoiceTask):
+            # shield：取消其中一条只影响它自己，不打断整组的合成
+            task.timing["prepare_start"] = _now()
+            await asyncio.shield(shared)
+            task.timing["prepare_end"] = _now()
+
+        for task in group:
+            task._prepare_task = asyncio.create_task(_member(task))
+
+    def _dispatch_lane(self, lane: Lane):
+        # 非 speaker 通道：不抢占，完成一个补一个，最多 limit 个并行
+        lane.running = [t for t in lane.running if not t._task.done()]
+        while len(lane.running) < lane.limit and self._peek_live(lane.queue):
+            task = lane.queue.pop()
+            self._start(task)
+            lane.running.append(task)
+
+    async def _dispatch_speaker(self):
+        # 1) 当前任务结束？恢复手动暂停的任务
+        if self.running and self.running._task.done():
+            self.running = None
+            # 只恢复 paused_stack（只有手动pause的任务会在这里）
+            while self.paused_stack and self.running is None:
+                prev = self.paused_stack.pop()
+                if prev._task and prev._task.done():
+                    continue
+                await prev.resume()
+                self.running = prev
+
+        # 2) idle 时：被抢占挂起的任务与排队任务比优先级，同级先恢复挂起的
+        if self.running is None:
+            sus = self._peek_suspended()
+            nxt = self._peek_live(self.queue)
+            if sus and (nxt is None or sus.priority >= nxt.priority):
+                self.suspended.pop()
+                await sus.resume()
+                self.running = sus
+                self.metrics.incr("resumed")
+                print(f"[Scheduler] 恢复挂起任务: {sus.name}")
+            elif nxt:
+                self.queue.pop()
+                self._start(nxt)
                 self.running = nxt
 
-            # 2) 抢占逻辑：只暂停，不入栈
-            if self.running and self.queue:
-                top_pri, _, top_task = self.queue[0]
-                if -top_pri > self.running.priority:
-                    heapq.heappop(self.queue)
-                    # 仅暂停，不保存到 paused_stack
-                    await self.running.pause()
-                    # 切换到新任务
-                    self.running = top_task
-                    top_task.start()
-
-            # 3) 当前任务结束？恢复手动暂停的任务
-            if self.running and self.running._task.done():
-                self.running = None
-                # 只恢复 paused_stack（只有手动pause的任务会在这里）
-                while self.paused_stack and self.running is None:
-                    prev = self.paused_stack.pop()
-                    await prev.resume()
-                    self.running = prev
-
-            await asyncio.sleep(0.05)
+        # 3) 抢占逻辑：可恢复的任务挂起进 suspended，其余只暂停
+        if self.running and self._peek_live(self.queue):
+            top_task = self.queue.peek()
+            if top_task.priority > self.running.priority:
+                self.queue.pop()
+                self.metrics.preempted(self.running.name, top_task.name)
+                await self._suspend(self.running)
+                # 切换到新任务
+                self.running = top_task
+                self._start(top_task)
+
+    def _peek_suspended(self) -> Optional[AsyncVoiceTask]:
+        # 挂起期间已经结束/被取消的任务直接丢掉
+        while self.suspended:
+            task = self.suspended.peek()
+            if not task._task.done():
+                return task
+            self.suspended.pop()
+        return None
+
+    async def _suspend(self, task: AsyncVoiceTask):
+        # 可混音的任务（背景音乐）不暂停，由混音器压低音量继续播放
+        if not task.duckable:
+            await task.pause()
+        if task.resumable:
+            self.suspended.push(task)
+            self.metrics.incr("suspended")
+            print(f"[Scheduler] 挂起任务: {task.name}（共 {len(self.suspended)} 个）")
 
 class PlayMusicTask(AsyncVoiceTask):
-    def __init__(self, ws_client = None):
+    duckable = True
+
+    def __init__(self, ws_client = None, query: Optional[str] = None):
         super().__init__(name="PlayMusic", priority=1, resumable=True)
+        # 点播关键词，如“播放 education”里的 education
+        self.query = query
         # files = sorted(music_dir.glob("*.mp3"))
         # if not files:
         #     raise FileNotFoundError(f"No mp3 under {music_dir}")
         self.player = None
         self.ws_client = ws_client
 
+    def _play_query(self):
+        hits = self.player.files.search(self.query) if self.query else []
+        if hits:
+            print(f"[MusicTask] 点播 {self.query!r}: {[p.name for p in hits]}")
+            for p in hits[1:]:
+                self.player.files.queue_next(p)
+            self.player.play_track(hits[0])
+        else:
+            self.player.play()
+
+    def request(self, query: Optional[str]):
+        """任务已存在时的再次“播放 xx”：换成点播的曲目，没有关键词则继续播放"""
+        self.query = query
+        # 还没开始执行的，execute() 会按新的 query 点播
+        if self._task is not None:
+            self._play_query()
+
     async def execute(self):
         print(f"[MusicTask] start, {len(self.player.files)} tracks")
-        self.player.play()
-        while True:
-            if self._cancel_event.is_set():
-                self.player.stop()
-                print("[MusicTask] canceled")
-                return
-            if self._paused_event.is_set():
+        self._play_query()
+        try:
+            # 挂起/恢复都是等待事件，暂停或空闲时不占用任何唤醒
+            while True:
+                await self.wait_suspended()
                 self.player.pause()
-                # 等待 paused_event 被 clear()（即收到 resume 命令）
-                while self._paused_event.is_set():
-                    await asyncio.sleep(0.1)
-                # 清除后恢复播放
+                await self.wait_resumed()
                 self.player.play()
-            await asyncio.sleep(0.1)
+        except asyncio.CancelledError:
+            self.player.stop()
+            print("[MusicTask] canceled")
+            raise
 
     # external control
     def cmd_pause(self):    asyncio.create_task(self.pause())
@@ -0,0 +1,116 @@
+# task_queue.py
+import heapq
+import math
+from typing import Dict, Hashable, Iterator, List, Optional
+
+
+class TaskQueue:
+    """
+    可寻址的优先队列（给 AudioScheduler 用）：
+      - 堆里的每个 entry 是 [-priority, deadline, counter, task, key]，同时按 id(task) 建索引；
+        同优先级内截止时间（task.deadline，无则视为无穷大）早的先出队，其次先来先服务
+      - remove() 只把 entry 标记为删除（task 置 None），O(1)；堆顶遇到时再丢弃，
+        删除数过半时整体压缩一次
+      - reprioritize() = 惰性删除 + 以原 counter 重新入堆，O(log n)，同优先级仍保持先来先服务
+      - coalesce：task.coalesce_key() 相同的待执行任务只保留一个；key 在入堆时算好存进 entry，
+        排队期间 task 的文字等变了也按当初的 key 删除
+    """
+    def __init__(self, coalesce: bool = True):
+        self.coalesce = coalesce
+        self._heap: List[list] = []
+        self._entries: Dict[int, list] = {}
+        self._keys: Dict[Hashable, list] = {}
+        self._counter = 0
+        self._removed = 0
+
+    # ------------ 内部方法 ------------
+    def _key_of(self, task) -> Optional[Hashable]:
+        if not self.coalesce:
+            return None
+        fn = getattr(task, "coalesce_key", None)
+        return fn() if fn else None
+
+    def _push_entry(self, task, counter: int):
+        deadline = getattr(task, "deadline", None)
+        key = self._key_of(task)
+        # counter 唯一，堆比较不会比到 task / key
+        entry = [-task.priority, math.inf if deadline is None else deadline, counter, task, key]
+        self._entries[id(task)] = entry
+        if key is not None:
+            self._keys[key] = entry
+        heapq.heappush(self._heap, entry)
+
+    def _discard(self, entry: list):
+        entry[3] = None
+        self._removed += 1
+        key = entry[4]
+        if key is not None and self._keys.get(key) is entry:
+            del self._keys[key]
+        if self._removed > 32 and self._removed * 2 > len(self._heap):
+            self._heap = [e for e in self._heap if e[3] is not None]
+            heapq.heapify(self._heap)
+            self._removed = 0
+
+    def _prune(self):
+        while self._heap and self._heap[0][3] is None:
+            heapq.heappop(self._heap)
+            self._removed -= 1
+
+    # ------------ 对外接口 ------------
+    def push(self, task):
+        """
+        入队；已有相同 coalesce_key 的待执行任务时不重复入队，返回已存在的那个任务，
+        否则返回 task 本身。
+        """
+        key = self._key_of(task)
+        if key is not None and key in self._keys:
+            return self._keys[key][3]
+        self._counter += 1
+        self._push_entry(task, self._counter)
+        return task
+
+    def remove(self, task) -> bool:
+        entry = self._entries.pop(id(task), None)
+        if entry is None:
+            return False
+        self._discard(entry)
+        return True
+
+    def reprioritize(self, task, priority: int) -> bool:
+        """修改排队中任务的优先级，不在队列里返回 False"""
+        entry = self._entries.pop(id(task), None)
+        if entry is None:
+            return False
+        counter = entry[2]
+        self._discard(entry)
+        task.priority = priority
+        self._push_entry(task, counter)
+        return True
+
+    def peek(self):
+        self._prune()
+        return self._heap[0][3] if self._heap else None
+
+    def pop(self):
+        self._prune()
+        entry = heapq.heappop(self._heap)
+        task = entry[3]
+        del self._entries[id(task)]
+        key = entry[4]
+        if key is not None and self._keys.get(key) is entry:
+            del self._keys[key]
+        return task
+
+    def head(self, k: int) -> List:
+        """出队顺序上的前 k 个任务（不出队），O(n log k)"""
+        return [e[3] for e in heapq.nsmallest(k, self._entries.values())]
+
+    def __contains__(self, task) -> bool:
+        return id(task) in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator:
+        """按出队顺序遍历（排序副本，仅用于展示/统计）"""
+        return iter([e[3] for e in sorted(self._entries.values())])
@@ -5,6 +5,7 @@ import configparser
 from pathlib import Path
 
 from voice_assistant.tasks.task_manager4 import AsyncVoiceTask, AudioScheduler
+from voice_assistant.tasks.executors import POOL_NETWORK, run_blocking
 from voice_assistant.player.mp3_player import MP3Player
 from voice_assistant.utils.tts_utils import speech_synthesize
 
@@ -24,13 +25,15 @@ class TTSTask(AsyncVoiceTask):
         self.text = text
         self.was_playing = was_playing
         self.player: MP3Player | None = None
+        self._mp3_path: Path | None = None
 
-    async def execute(self):
-        # 在 executor 中调用阻塞的合成函数
-        loop = asyncio.get_running_loop()
-        mp3_path = await loop.run_in_executor(None, speech_synthesize, self.text)
-        print(f"[TTSTask] 合成完成，文件：{mp3_path}")
+    async def prepare(self):
+        # 在 network 线程池中调用阻塞的合成函数；排队期间提前执行
+        self._mp3_path = await run_blocking(POOL_NETWORK, speech_synthesize, self.text)
+        print(f"[TTSTask] 合成完成，文件：{self._mp3_path}")
 
+    async def play(self):
+        mp3_path = self._mp3_path
         # 播放 TTS 文件
         # 延迟少许确保播放器已注入
         await asyncio.sleep(0.1)
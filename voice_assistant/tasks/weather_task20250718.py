@@ -1,16 +1,16 @@
 # weather_task.py
 
 import asyncio
-import requests
 import configparser
 from pathlib import Path
 from uuid import uuid4
 
 from voice_assistant.tasks.task_manager4 import AsyncVoiceTask, AudioScheduler
+from voice_assistant.tasks.executors import POOL_NETWORK, run_blocking
 
 from voice_assistant.player.mp3_player import  MP3Player
 from datetime import datetime
-from voice_assistant.utils.tts_utils    import speech_synthesize
+from voice_assistant.tasks.speak_task import SpeakTextTask
 
 # 读取配置
 cfg = configparser.ConfigParser()
@@ -26,30 +26,43 @@ class WeatherTask(AsyncVoiceTask):
     def __init__(self, was_playing=False, ws_client=None):
         super().__init__(name="Weather", priority=10, resumable=False)
         self.player = None
-        self.api_key =  cfg.get('weather', 'api_key')
-        self.base_url =  cfg.get('weather', 'base_url')
+        self.api_key =  cfg.get('weather', 'api_key', fallback=None)
+        self.base_url =  cfg.get('weather', 'base_url', fallback=None)
         self.was_playing = was_playing
         self.ws_client = ws_client
+        # 播报交给 SpeakTextTask：按句切开，边合成边播
+        self._speech: SpeakTextTask | None = None
 
 
-    async def execute(self):
+    async def prepare(self):
+        # 1)、2) 只走网络，排队期间由调度器提前执行
         # --- 1) 查询天气 ---
         weather_text = await self._query_weather()
         print(f"[WeatherTask] API 返回: {weather_text}")
 
-        # --- 2) 生成 TTS MP3 ---
-        tts_file = await asyncio.get_running_loop().run_in_executor(
-            None, speech_synthesize, weather_text
-        )
-        print(f"[WeatherTask] 生成 TTS 文件: {tts_file.name}")
-
-        # --- 3) 播放 TTS 并自动恢复歌单 ---
-        # 假设你的 MP3Player 有 is_playing() 方法
-        self.player.play_file(self.was_playing,tts_file, resume_playlist=True)
+        if not weather_text:
+            return
+        # --- 2) 准备播报（开头几句先开始合成） ---
+        self._speech = SpeakTextTask(weather_text, priority=self.priority)
+        self._speech.player = self.player
+        await self._speech.prepare()
+
+    async def play(self):
+        # --- 3) 叠加播放 TTS，播完才结束 ---
+        if self._speech is None:
+            return
+        await self._speech.play()
         print("[WeatherTask] 播放 TTS，任务完成")
 
+    async def cancel(self):
+        if self._speech is not None:
+            self._speech._stop_stream()
+        await super().cancel()
+
     async def _query_weather(self) -> str:
         """获取深圳市的当前天气信息"""
+        # 只有真正查天气时才需要 requests（simulation 里会替换掉本方法）
+        import requests
         city = "Shenzhen"  # 城市名称
         params = {
             "q": city,  # 查询城市
@@ -66,7 +79,10 @@ class WeatherTask(AsyncVoiceTask):
         # 发送 HTTP 请求
         try:
             # 超时时间设置为5秒
-            response = requests.get(self.base_url, params=params, timeout=5)
+            # 阻塞请求放 network 线程池，不卡调度循环
+            response = await run_blocking(
+                POOL_NETWORK, requests.get, self.base_url, params=params, timeout=5
+            )
         except requests.exceptions.Timeout:
             return "暂未获取到天气信息"
 
@@ -90,7 +106,8 @@ class WeatherTask(AsyncVoiceTask):
             print(f"湿度：{humidity}%")
             print(f"天气状况：{description}")
 
-            weather_shenzhen = f"今日是：{timestamp}，深圳市当前天气情况：{description}，温度：{temp}度，体感温度：{feels_like}度，湿度百分之：{humidity}。"
+            # 时间单独成句，后面的天气句不随时间变化，可以命中逐句缓存
+            weather_shenzhen = f"今日是：{timestamp}。深圳市当前天气情况：{description}，温度：{temp}度，体感温度：{feels_like}度，湿度百分之：{humidity}。"
             print(weather_shenzhen)
             self.ws_client.send_status_update('info', weather_shenzhen)
 
@@ -0,0 +1,199 @@
+# concat_tts.py
+import re
+import threading
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+from voice_assistant.nlu.nlu import WEEKDAYS
+from voice_assistant.player.pcm_cache import PCMCache, CHANNELS, ms_to_frames
+from voice_assistant.tts.phrase_bank import PhraseBank
+
+# 相邻片段之间的交叉淡入淡出长度
+CROSSFADE_MS = 12
+# 逗号/冒号/句号处插入的停顿
+PAUSE_MS = 120
+# 片段首尾静音裁剪：幅度低于满幅的这个比例视为静音；裁剪后保留一点余量
+SILENCE_THRESH = 0.02
+TRIM_MARGIN_MS = 8
+
+
+class FreeText(str):
+    """拼接计划里需要整句合成的自由文字（如提醒内容），走 TTS 缓存"""
+
+
+Piece = Union[str, int, FreeText]
+
+
+def fragment_texts(today: Optional[date] = None) -> List[str]:
+    """全部固定片段：前缀、时/分、年/月/日、星期；数量固定，与说过多少句话无关"""
+    year = (today or date.today()).year
+    texts = ["现在是", "今天是", "提醒您", "提醒", "已为您设置提醒"]
+    texts += [f"{h}点" for h in range(24)]
+    texts += [f"{m}分" for m in range(60)]
+    texts += [f"{y}年" for y in (year, year + 1)]
+    texts += [f"{m}月" for m in range(1, 13)]
+    texts += [f"{d}日" for d in range(1, 32)]
+    texts += [f"星期{w}" for w in WEEKDAYS]
+    return texts
+
+
+def _clock(h: str, m: str) -> List[Piece]:
+    return [f"{int(h)}点", f"{int(m)}分"]
+
+
+def _tail(text: str) -> List[Piece]:
+    """句尾的自由文字：能套上模板的继续拆，否则整句合成"""
+    return plan(text) or [FreeText(text)]
+
+
+# (模板正则, 拼接计划)；与 nlu.py 里的播报模板一一对应
+TEMPLATES = [
+    # time_text：现在是14点5分。
+    (re.compile(r"^现在是(\d{1,2})点(\d{1,2})分。$"),
+     lambda m: ["现在是", *_clock(m[1], m[2])]),
+    # date_text：今天是2025年7月18日，星期五。
+    (re.compile(r"^今天是(\d{4})年(\d{1,2})月(\d{1,2})日，星期(.)。$"),
+     lambda m: ["今天是", f"{m[1]}年", f"{int(m[2])}月", f"{int(m[3])}日", PAUSE_MS, f"星期{m[4]}"]),
+    # reminder_fire_text：现在是07点30分，提醒您：...
+    (re.compile(r"^现在是(\d{1,2})点(\d{1,2})分，提醒您：(.+)$"),
+     lambda m: ["现在是", *_clock(m[1], m[2]), PAUSE_MS, "提醒您", PAUSE_MS, *_tail(m[3])]),
+    # reminder_added_text：已为您设置提醒：7点，30分，...
+    (re.compile(r"^已为您设置提醒：(\d{1,2})点，(\d{1,2})分，(.+)$"),
+     lambda m: ["已为您设置提醒", PAUSE_MS, *_clock(m[1], m[2]), PAUSE_MS, *_tail(m[3])]),
+    # 提醒内容本身：提醒：7点，30分，...
+    (re.compile(r"^提醒：(\d{1,2})点，(\d{1,2})分，(.+)$"),
+     lambda m: ["提醒", PAUSE_MS, *_clock(m[1], m[2]), PAUSE_MS, *_tail(m[3])]),
+]
+
+
+def plan(text: str) -> Optional[List[Piece]]:
+    """把文字拆成 片段 / 停顿(ms) / 自由文字；不是已知模板返回 None"""
+    text = text.strip()
+    for pattern, build in TEMPLATES:
+        m = pattern.match(text)
+        if m:
+            return build(m)
+    return None
+
+
+def _trim(pcm: np.ndarray) -> np.ndarray:
+    """裁掉首尾静音（pcm 形状为 (帧数, 声道)）"""
+    loud = np.flatnonzero(np.abs(pcm).max(axis=1) > SILENCE_THRESH * 32767)
+    if not len(loud):
+        return pcm[:0]
+    margin = ms_to_frames(TRIM_MARGIN_MS)
+    return pcm[max(0, loud[0] - margin):loud[-1] + 1 + margin]
+
+
+def stitch(chunks: List[np.ndarray], crossfade_ms: int = CROSSFADE_MS) -> bytes:
+    """按顺序拼接 int16 片段，相邻处线性交叉淡化，返回 PCMCache 同格式的字节"""
+    xf = ms_to_frames(crossfade_ms)
+    out: List[np.ndarray] = []
+    tail: Optional[np.ndarray] = None
+    for c in chunks:
+        c = c.astype(np.float32)
+        if tail is None:
+            tail = c
+            continue
+        k = min(xf, len(tail), len(c))
+        if k:
+            ramp = np.linspace(0.0, 1.0, k, dtype=np.float32)[:, None]
+            mixed = tail[-k:] * (1 - ramp) + c[:k] * ramp
+            out.append(tail[:-k])
+            out.append(mixed)
+            tail = c[k:]
+        else:
+            out.append(tail)
+            tail = c
+    if tail is not None:
+        out.append(tail)
+    if not out:
+        return b""
+    return np.clip(np.concatenate(out), -32768, 32767).astype(np.int16).tobytes()
+
+
+class ConcatRenderer:
+    """
+    拼接式合成（报时/日期/提醒这类带数字的模板句）：
+      - 固定片段（时、分、年月日、星期、前缀）用一个单独的 PhraseBank 预合成成 PCM，
+        加载后裁掉首尾静音常驻内存，总数固定（约 140 个）
+      - render() 按 plan() 的拆分把片段交叉淡化拼成一段 PCM，本地几毫秒完成
+      - 提醒内容等自由文字仍按整句合成（走 TTS 缓存，同一句只合成一次）
+      - 片段不全时返回 None 并在后台补齐，调用方退回整句合成
+    """
+    def __init__(self, pcm_cache: PCMCache, manifest_path: Optional[Path] = None):
+        self.pcm_cache = pcm_cache
+        self.fragments = PhraseBank(pcm_cache, manifest_path or pcm_cache.cache_dir / "fragments.json")
+        self._pcm: Dict[str, np.ndarray] = {}
+        self.lock = threading.Lock()
+        self.rendered = 0
+        self.fallbacks = 0
+
+    def _load(self, pcm_path: Path) -> np.ndarray:
+        data = np.fromfile(pcm_path, dtype=np.int16)
+        return _trim(data[: len(data) - len(data) % CHANNELS].reshape(-1, CHANNELS))
+
+    def _fragment(self, text: str) -> Optional[np.ndarray]:
+        with self.lock:
+            pcm = self._pcm.get(text)
+        if pcm is not None:
+            return pcm
+        entry = self.fragments.lookup(text)
+        if entry is None:
+            return None
+        pcm = self._load(self.pcm_cache.cache_dir / f"{entry['key']}.pcm")
+        with self.lock:
+            self._pcm[text] = pcm
+        return pcm
+
+    def _free_text(self, text: str) -> np.ndarray:
+        # 延迟导入：只拼片段时不需要 dashscope
+        from voice_assistant.utils.tts_utils import speech_synthesize
+
+        return self._load(self.pcm_cache.ensure_on_disk(speech_synthesize(text)))
+
+    def warm_up(self):
+        """后台补齐缺失的片段"""
+        self.fragments.warm_up({t: None for t in fragment_texts()})
+
+    def render(self, pieces: List[Piece]) -> Optional[bytes]:
+        """
+        阻塞调用；含 FreeText 时会请求 TTS（放 network 线程池），否则只是本地计算。
+        有片段未收录时返回 None。
+        """
+        # 先确认片段齐全，缺了就不必再为自由文字请求 TTS
+        frags = {p: self._fragment(p) for p in pieces
+                 if isinstance(p, str) and not isinstance(p, FreeText)}
+        missing = [p for p, pcm in frags.items() if pcm is None]
+        if missing:
+            print(f"[ConcatRenderer] 缺少片段 {missing}，本次整句合成")
+            self.fallbacks += 1
+            self.warm_up()
+            return None
+        chunks = []
+        for p in pieces:
+            if isinstance(p, int):
+                chunks.append(np.zeros((ms_to_frames(p), CHANNELS), dtype=np.int16))
+            elif isinstance(p, FreeText):
+                chunks.append(self._free_text(p))
+            else:
+                chunks.append(frags[p])
+        self.rendered += 1
+        return stitch(chunks)
+
+    def stats(self) -> dict:
+        return {
+            "fragments": len(self.fragments.phrases),
+            "loaded": len(self._pcm),
+            "rendered": self.rendered,
+            "fallbacks": self.fallbacks,
+        }
+
+
+if __name__ == "__main__":
+    # 用法：python -m voice_assistant.tts.concat_tts   离线合成全部片段
+    renderer = ConcatRenderer(PCMCache())
+    renderer.fragments.build({t: None for t in fragment_texts()})
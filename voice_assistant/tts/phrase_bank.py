@@ -0,0 +1,221 @@
+# phrase_bank.py
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from voice_assistant.nlu.nlu import (
+    NO_REMINDERS, REMINDER_NOT_FOUND,
+    date_text, reminder_fire_text, reminder_item_text, reminder_removed_text,
+)
+from voice_assistant.player.pcm_cache import PCMCache, FRAME_BYTES, frames_to_ms
+from voice_assistant.utils.tts_cache import normalize_text
+
+# _handle_command / ReminderManager 经 SpeakTextTask 说出的、不带变量的回复
+# （其余状态提示只发到 WebUI，不出声，不必预合成）
+FIXED_PHRASES = [
+    NO_REMINDERS,
+    REMINDER_NOT_FOUND,
+]
+# “已删除第N条提醒”预合成到第几条
+MAX_REMINDER_INDEX = 20
+# 离线构建时日期播报覆盖未来几天
+BUILD_DAYS = 30
+# 启动预热：日期覆盖今明两天
+# （报时句“现在是H点M分。”不进库：ConcatRenderer 用 24+60 个片段就能拼出全部 1440 条）
+WARM_DAYS = 1
+# 预热/构建时并发合成的线程数（不占 executors 里的 network 池，避免和实时请求抢线程）
+BUILD_WORKERS = 2
+
+
+def date_phrases(days_ahead: int, today: Optional[date] = None) -> Dict[str, str]:
+    """今天起 days_ahead 天的日期播报，返回 {文字: 当天日期}（过期后可清理）"""
+    today = today or date.today()
+    out = {}
+    for d in range(days_ahead + 1):
+        day = today + timedelta(days=d)
+        out[date_text(datetime(day.year, day.month, day.day))] = day.isoformat()
+    return out
+
+
+def reminder_phrases(reminders: Iterable) -> List[str]:
+    """当前提醒的到点播报与“列出提醒”的每一条"""
+    texts = []
+    for i, r in enumerate(reminders, 1):
+        h, m = map(int, r.at_time.split(":"))
+        texts.append(reminder_fire_text(r.message, datetime.now().replace(hour=h, minute=m)))
+        texts.append(reminder_item_text(i, r.at_time, r.message))
+    return texts
+
+
+def enumerate_phrases(days_ahead: int = BUILD_DAYS, reminders: Iterable = ()) -> Dict[str, Optional[str]]:
+    """
+    _handle_command / ReminderManager 会说出的固定和模板回复，
+    返回 {文字: 过期日期或 None}
+    """
+    phrases: Dict[str, Optional[str]] = {t: None for t in FIXED_PHRASES}
+    phrases.update((reminder_removed_text(i), None) for i in range(1, MAX_REMINDER_INDEX + 1))
+    phrases.update(date_phrases(days_ahead))
+    phrases.update((t, None) for t in reminder_phrases(reminders))
+    return phrases
+
+
+class PhraseBank:
+    """
+    常用回复的预合成库：
+      - build() 把文字合成（走 TTS 缓存并 pin 住）后解码成 PCMCache 的 .pcm，同样 pin 住，
+        播放时直接 mmap，不再请求网络也不再解码
+      - phrasebank.json 记录 文字 -> mp3 路径 / PCM key / 时长，启动时加载进内存，lookup() 只查字典
+      - 日期类条目带过期日，过期后在下次构建时移除
+    """
+    def __init__(self, pcm_cache: PCMCache, manifest_path: Optional[Path] = None):
+        self.pcm_cache = pcm_cache
+        self.manifest_path = manifest_path or pcm_cache.cache_dir / "phrasebank.json"
+        self.phrases: Dict[str, dict] = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._warming: Optional[threading.Thread] = None
+        self._load()
+
+    # ------------ 内部方法 ------------
+    def _load(self):
+        if self.manifest_path.exists():
+            try:
+                with open(self.manifest_path, "r", encoding="utf-8") as f:
+                    self.phrases = json.load(f).get("phrases", {})
+            except (OSError, ValueError) as e:
+                print(f"[PhraseBank] 清单损坏，忽略: {e}")
+        # 文件缺失（如 PCM 被手动清掉）的条目丢弃，下次构建再补
+        for text in list(self.phrases):
+            entry = self.phrases[text]
+            if Path(entry["mp3"]).exists() and (self.pcm_cache.cache_dir / f"{entry['key']}.pcm").exists():
+                self.pcm_cache.pinned.add(entry["key"])
+            else:
+                del self.phrases[text]
+        print(f"[PhraseBank] 已加载 {len(self.phrases)} 条预合成回复")
+
+    def _save(self):
+        with self.lock:
+            data = {"version": 1, "updated": time.strftime("%Y-%m-%d %H:%M:%S"), "phrases": dict(self.phrases)}
+        tmp = self.manifest_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.manifest_path)
+
+    def _build_one(self, text: str, expires: Optional[str]) -> dict:
+        # 延迟导入：只查询时不需要 dashscope
+        from voice_assistant.utils.tts_utils import TTS_FORMAT, TTS_MODEL, TTS_VOICE, speech_synthesize
+        from voice_assistant.utils.tts_cache import get_cache
+
+        mp3_path = speech_synthesize(text)
+        get_cache().pin(text, TTS_MODEL, TTS_VOICE, TTS_FORMAT)
+        pcm_path = self.pcm_cache.ensure_on_disk(mp3_path)
+        frames = pcm_path.stat().st_size // FRAME_BYTES
+        return {
+            "mp3": str(mp3_path),
+            "key": self.pcm_cache.key(mp3_path),
+            "duration_ms": round(frames_to_ms(frames)),
+            "expires": expires,
+        }
+
+    def _prune(self, keep: Optional[Dict[str, Optional[str]]] = None) -> int:
+        """清理过期条目；给了 keep 时，不在其中的条目也一并移除（如旧版收录的报时句）"""
+        today = date.today().isoformat()
+        wanted = None if keep is None else {normalize_text(t) for t in keep}
+        removed = 0
+        with self.lock:
+            for text in list(self.phrases):
+                entry = self.phrases[text]
+                if (entry.get("expires") and entry["expires"] < today) or \
+                        (wanted is not None and text not in wanted):
+                    del self.phrases[text]
+                    self.pcm_cache.remove(entry["key"])
+                    removed += 1
+        return removed
+
+    # ------------ 对外接口 ------------
+    def lookup(self, text: str) -> Optional[dict]:
+        """命中返回 {"mp3", "key", "duration_ms", ...}，未收录返回 None"""
+        entry = self.phrases.get(normalize_text(text))
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def missing(self, phrases: Dict[str, Optional[str]]) -> Dict[str, Optional[str]]:
+        return {t: e for t, e in phrases.items() if normalize_text(t) not in self.phrases}
+
+    def build(self, phrases: Dict[str, Optional[str]], workers: int = BUILD_WORKERS,
+              exact: bool = False) -> Dict[str, int]:
+        """
+        增量构建：只合成还没收录的文字，顺带清理过期条目；
+        exact=True 时 phrases 视为完整清单，清单之外的条目删除并释放 PCM。
+        返回 {"added": n, "skipped": n, "failed": n, "removed": n}
+        """
+        todo = self.missing(phrases)
+        stats = {"added": 0, "skipped": len(phrases) - len(todo), "failed": 0,
+                 "removed": self._prune(phrases if exact else None)}
+
+        def work(item):
+            text, expires = item
+            try:
+                entry = self._build_one(text, expires)
+            except Exception as e:
+                print(f"[PhraseBank] 合成失败 {text!r}: {e}")
+                with self.lock:
+                    stats["failed"] += 1
+                return
+            with self.lock:
+                self.phrases[normalize_text(text)] = entry
+                self.pcm_cache.pinned.add(entry["key"])
+                stats["added"] += 1
+                done = stats["added"]
+            # 长时间构建中途也落盘，断了可以续
+            if done % 50 == 0:
+                self._save()
+                print(f"[PhraseBank] 已合成 {done}/{len(todo)}")
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="va-phrasebank") as pool:
+            list(pool.map(work, todo.items()))
+        self._save()
+        print(f"[PhraseBank] 构建完成: {stats}")
+        return stats
+
+    def warm_up(self, phrases: Dict[str, Optional[str]]):
+        """后台线程补齐缺失的条目，不阻塞调用方；上一轮还没跑完时直接跳过"""
+        todo = self.missing(phrases)
+        if not todo or (self._warming and self._warming.is_alive()):
+            return
+        print(f"[PhraseBank] 预热 {len(todo)} 条")
+        self._warming = threading.Thread(target=self.build, args=(todo,), daemon=True)
+        self._warming.start()
+
+    def startup_phrases(self, reminders: Iterable = ()) -> Dict[str, Optional[str]]:
+        """启动时需要保证的条目：固定回复、今明两天日期和已有提醒"""
+        phrases: Dict[str, Optional[str]] = {t: None for t in FIXED_PHRASES}
+        phrases.update(date_phrases(WARM_DAYS))
+        phrases.update((t, None) for t in reminder_phrases(reminders))
+        return phrases
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.phrases),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else None,
+        }
+
+
+if __name__ == "__main__":
+    import sys
+
+    # 用法：python -m voice_assistant.tts.phrase_bank [日期覆盖天数]
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else BUILD_DAYS
+    PhraseBank(PCMCache()).build(enumerate_phrases(days), exact=True)
@@ -0,0 +1,92 @@
+# segmenter.py
+import re
+from typing import List
+
+# 每句最长字数：超过的再按逗号/顿号/冒号切开，实在没有标点就硬切
+MAX_CHARS = 60
+# 短于这个字数的句子并到相邻句里，避免一两个字单独合成、语气断开
+MIN_CHARS = 4
+
+# 句末：中文句号/问号/叹号/分号/省略号（可连写，可跟右引号/括号）；
+# 英文句点只在后面是空白或结尾时算句末（不切开 3.5 这类写法）；换行也算句末
+_SENTENCE_END = re.compile(r"[。！？；!?…]+[”’\"'）)]*|\.(?=\s|$)[\"')]*|\n+")
+_CLAUSE_END = re.compile(r"[，,、：:]")
+_CJK_PUNCT = re.compile(r"[。！？；…，、：”’）]")
+# 以这些缩写结尾的英文句点不算句末（如 "e.g. fine" 不在 e.g. 后切开）
+_ABBREV = re.compile(r"(?:^|[^A-Za-z.])(?:e\.g|i\.e|etc|vs|Mr|Mrs|Ms|Dr|St|No)\.$", re.IGNORECASE)
+
+
+def _join(a: str, b: str) -> str:
+    # 中英文交界（及英文之间）补一个空格，避免 "fine?好" 这样粘在一起；
+    # 中文之间、中文标点之后直接相连
+    if a and b and (a[-1].isascii() or b[0].isascii()) and not (a[-1].isspace() or b[0].isspace()) \
+            and not _CJK_PUNCT.match(a[-1]):
+        return f"{a} {b}"
+    return a + b
+
+
+def _split_long(sentence: str, max_chars: int) -> List[str]:
+    if len(sentence) <= max_chars:
+        return [sentence]
+    parts: List[str] = []
+    cur = ""
+    start = 0
+    for m in _CLAUSE_END.finditer(sentence):
+        clause = sentence[start:m.end()]
+        start = m.end()
+        if cur and len(cur) + len(clause) > max_chars:
+            parts.append(cur)
+            cur = ""
+        cur += clause
+    cur += sentence[start:]
+    parts.append(cur)
+    out: List[str] = []
+    for p in parts:
+        p = p.strip()
+        out.extend(p[i:i + max_chars] for i in range(0, len(p), max_chars))
+    return [p for p in out if p]
+
+
+def split_sentences(text: str, max_chars: int = MAX_CHARS, min_chars: int = MIN_CHARS) -> List[str]:
+    """
+    按中英文句末标点把长文本切成句子，句末标点留在句子里。
+    过长的句子按分句标点再切，过短的并到前一句。
+    """
+    raw: List[str] = []
+    start = 0
+    for m in _SENTENCE_END.finditer(text):
+        if text[m.start()] == "." and _ABBREV.search(text, 0, m.start() + 1):
+            continue
+        raw.append(text[start:m.end()])
+        start = m.end()
+    raw.append(text[start:])
+
+    sentences: List[str] = []
+    for s in raw:
+        s = s.strip()
+        if s:
+            sentences.extend(_split_long(s, max_chars))
+
+    merged: List[str] = []
+    for s in sentences:
+        if merged and (len(s) < min_chars or len(merged[-1]) < min_chars) \
+                and len(merged[-1]) + len(s) <= max_chars:
+            merged[-1] = _join(merged[-1], s)
+        else:
+            merged.append(s)
+    return merged
+
+
+if __name__ == "__main__":
+    # 用法：python -m voice_assistant.tts.segmenter   自检几个容易切错的例子
+    cases = {
+        "好的。今天晴，最高气温三十二度！": ["好的。今天晴，最高气温三十二度！"],
+        "This is e.g. fine?好": ["This is e.g. fine? 好"],
+        "Version 3.5 is out. Try it": ["Version 3.5 is out.", "Try it"],
+        "Talk to Dr. Li. OK": ["Talk to Dr. Li. OK"],
+        "好的。OK then. 明天见。": ["好的。OK then.", "明天见。"],
+    }
+    for text, expected in cases.items():
+        got = split_sentences(text)
+        print(f"{'OK  ' if got == expected else 'FAIL'} {text!r} -> {got}")
+        assert got == expected, expected
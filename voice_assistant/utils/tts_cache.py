@@ -0,0 +1,240 @@
+# tts_cache.py
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional
+
+DEFAULT_DIR = Path("/home/hugd/privateprojects/personalvoicehelper/tmp/speechsynth")
+# 索引写回文件的最小间隔（秒）：命中、新增都只改内存，攒够间隔再落盘；
+# 进程异常退出时漏记的新文件由启动时的磁盘核对补回
+FLUSH_INTERVAL_S = 30
+
+
+def normalize_text(text: str) -> str:
+    """只做 NFKC 和首尾空白处理；标点会影响停顿和语调，保留在 key 里"""
+    return unicodedata.normalize("NFKC", text).strip()
+
+
+def cache_key(text: str, model: str, voice: str, fmt: str) -> str:
+    """完整的 sha256：文字 + 模型 + 音色 + 格式，任一不同都是不同的音频"""
+    raw = json.dumps([normalize_text(text), model, voice, fmt], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """
+    内容寻址的 TTS 缓存：
+      - key = sha256(文字, 模型, 音色, 格式)，文件名就是 key
+      - 索引（大小/创建/最近访问时间）常驻内存，启动时从 index.json 加载并核对一次磁盘，
+        之后查询不再访问文件系统
+      - 超过 max_age_s 未用的先淘汰，总量超过 max_bytes 时按最近访问时间淘汰；pinned 的条目不淘汰
+      - 先写临时文件再原子替换，同一个 key 并发请求只合成一次
+    """
+    def __init__(
+        self,
+        cache_dir: Path = DEFAULT_DIR,
+        max_bytes: int = 512 * 1024 ** 2,
+        max_age_s: float = 30 * 24 * 3600,
+    ):
+        self.cache_dir = cache_dir
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = cache_dir / "index.json"
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+
+        # key -> {"file", "size", "created", "last_used", "text", "model", "voice", "pinned"}，按最近访问排序
+        self._index: "OrderedDict[str, dict]" = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._dirty = False
+        self._flushed_at = time.time()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._load()
+
+    # ------------ 索引 ------------
+    def _load(self):
+        entries = {}
+        if self.index_path.exists():
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    entries = json.load(f).get("entries", {})
+            except (OSError, ValueError) as e:
+                print(f"[TTSCache] 索引损坏，重建: {e}")
+        # 启动时核对一次磁盘：丢掉文件已不存在的条目，收录索引之外的缓存文件
+        on_disk = {p.name: p for p in self.cache_dir.iterdir() if p.is_file()}
+        for key, e in entries.items():
+            if e["file"] in on_disk:
+                self._index[key] = e
+        indexed = {e["file"] for e in self._index.values()}
+        for name, p in on_disk.items():
+            key = p.stem
+            if name in indexed or len(key) != 64 or p.suffix.startswith((".json", ".tmp")):
+                continue
+            st = p.stat()
+            self._index[key] = {"file": name, "size": st.st_size, "created": st.st_mtime,
+                                "last_used": st.st_mtime, "text": "", "model": "", "voice": ""}
+        for key in sorted(self._index, key=lambda k: self._index[k]["last_used"]):
+            self._index.move_to_end(key)
+        self.total_bytes = sum(e["size"] for e in self._index.values())
+        print(f"[TTSCache] 已加载索引: {len(self._index)} 条, {self.total_bytes // 1024} KB")
+        with self.lock:
+            self._evict()
+            self._save()
+
+    def _save(self):
+        tmp = self.index_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"entries": self._index}, f, ensure_ascii=False)
+        os.replace(tmp, self.index_path)
+        self._dirty = False
+        self._flushed_at = time.time()
+
+    def _maybe_flush(self):
+        if self._dirty and time.time() - self._flushed_at >= FLUSH_INTERVAL_S:
+            self._save()
+
+    def _evict(self):
+        now = time.time()
+        victims = [k for k, e in self._index.items()
+                   if not e.get("pinned") and now - e["last_used"] > self.max_age_s]
+        # OrderedDict 头部即最久未用
+        over = self.total_bytes - sum(self._index[k]["size"] for k in victims)
+        for k, e in self._index.items():
+            if over <= self.max_bytes:
+                break
+            if e.get("pinned") or k in victims:
+                continue
+            victims.append(k)
+            over -= e["size"]
+        for k in victims:
+            e = self._index.pop(k)
+            self.total_bytes -= e["size"]
+            (self.cache_dir / e["file"]).unlink(missing_ok=True)
+            self.evictions += 1
+        if victims:
+            self._dirty = True
+            print(f"[TTSCache] 淘汰 {len(victims)} 条，剩余 {self.total_bytes // 1024} KB")
+
+    # ------------ 对外接口 ------------
+    def get(self, text: str, model: str, voice: str, fmt: str = "mp3") -> Optional[Path]:
+        """命中返回文件路径（只查内存索引），未命中返回 None"""
+        return self.get_any(text, model, voice, (fmt,))
+
+    def get_any(self, text: str, model: str, voice: str, fmts: Iterable[str]) -> Optional[Path]:
+        """按 fmts 的顺序找同一句的任一格式；无论查了几种格式都只记一次命中/未命中"""
+        with self.lock:
+            for fmt in fmts:
+                key = cache_key(text, model, voice, fmt)
+                e = self._index.get(key)
+                if e is None:
+                    continue
+                self.hits += 1
+                e["last_used"] = time.time()
+                self._index.move_to_end(key)
+                self._dirty = True
+                self._maybe_flush()
+                return self.cache_dir / e["file"]
+            self.misses += 1
+            return None
+
+    def put(self, text: str, model: str, voice: str, fmt: str, audio: bytes,
+            pinned: bool = False) -> Path:
+        key = cache_key(text, model, voice, fmt)
+        name = f"{key}.{fmt}"
+        path = self.cache_dir / name
+        tmp = path.with_suffix(f".tmp{threading.get_ident()}")
+        with open(tmp, "wb") as f:
+            f.write(audio)
+        os.replace(tmp, path)
+        now = time.time()
+        with self.lock:
+            old = self._index.pop(key, None)
+            if old:
+                self.total_bytes -= old["size"]
+            self._index[key] = {"file": name, "size": len(audio), "created": now, "last_used": now,
+                                "text": normalize_text(text)[:80], "model": model, "voice": voice,
+                                "pinned": pinned or bool(old and old.get("pinned"))}
+            self.total_bytes += len(audio)
+            self._evict()
+            self._dirty = True
+            self._maybe_flush()
+        return path
+
+    def get_or_create(self, text: str, model: str, voice: str, fmt: str,
+                      synthesize: Callable[[], bytes]) -> Path:
+        """命中直接返回；否则调用 synthesize() 生成并入库（同一 key 并发时只合成一次）"""
+        path = self.get(text, model, voice, fmt)
+        if path is not None:
+            return path
+        key = cache_key(text, model, voice, fmt)
+        with self.lock:
+            klock = self._key_locks.setdefault(key, threading.Lock())
+        with klock:
+            with self.lock:
+                e = self._index.get(key)
+            if e is not None:
+                return self.cache_dir / e["file"]
+            path = self.put(text, model, voice, fmt, synthesize())
+        with self.lock:
+            self._key_locks.pop(key, None)
+        return path
+
+    def pin(self, text: str, model: str, voice: str, fmt: str = "mp3") -> bool:
+        """标记为常驻（不参与淘汰），如固定话术"""
+        key = cache_key(text, model, voice, fmt)
+        with self.lock:
+            e = self._index.get(key)
+            if e is None:
+                return False
+            e["pinned"] = True
+            self._dirty = True
+            return True
+
+    def flush(self):
+        with self.lock:
+            if self._dirty:
+                self._save()
+
+    def stats(self) -> dict:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._index),
+                "bytes": self.total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else None,
+                "evictions": self.evictions,
+            }
+
+
+_caches: Dict[Path, TTSCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(cache_dir: Path = DEFAULT_DIR) -> TTSCache:
+    """每个目录一个进程内共享的 TTSCache"""
+    with _caches_lock:
+        cache = _caches.get(cache_dir)
+        if cache is None:
+            cache = _caches[cache_dir] = TTSCache(cache_dir)
+            # 索引是攒着写的，退出前补写一次
+            atexit.register(cache.flush)
+        return cache
+
+
+def cache_stats() -> dict:
+    """已创建的各 TTS 缓存的命中统计（未使用过则为空）"""
+    with _caches_lock:
+        return {str(d): c.stats() for d, c in _caches.items()}
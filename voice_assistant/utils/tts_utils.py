@@ -1,40 +1,176 @@
 import configparser
+import io
+import threading
+import wave
 from pathlib import Path
+from typing import Callable, List, Optional
 
-import re
-import hashlib
-from dashscope.audio.tts_v2 import *
-import dashscope
+try:
+    import dashscope
+    from dashscope.audio.tts_v2 import AudioFormat, ResultCallback, SpeechSynthesizer
+except ImportError:
+    # 没装 SDK 的环境（CI 里跑 simulation 等）只用缓存 / 假后端，真正合成时才会报错
+    dashscope = None
+    ResultCallback = object
+
+from voice_assistant.utils.tts_cache import DEFAULT_DIR, get_cache
 
 # 读取配置
 cfg = configparser.ConfigParser()
 cfg.read('/home/hugd/privateprojects/personalvoicehelper/env/config.ini')
 
-dashscope.api_key = cfg.get('llmapi', 'aliyun_api_key')
+# 没有配置文件时不在 import 时报错，调用接口时再由 SDK 报鉴权失败
+if dashscope is not None:
+    dashscope.api_key = cfg.get('llmapi', 'aliyun_api_key', fallback=None)
+
+# 合成参数；都会进入缓存 key，换模型/音色不会命中旧文件
+TTS_MODEL = "cosyvoice-v1"
+TTS_VOICE = "longxiaochun"
+TTS_FORMAT = "mp3"
+# 流式合成：按原始 PCM 分片回调，整句收齐后以 wav 存入缓存（与合并合成切出的片段同格式）
+STREAM_RATE = 22050
+STREAM_CHANNELS = 1
+STREAM_FORMAT = "wav"
+
 
-# --------------- 工具函数 ---------------
-def generate_hash_file_name(text: str) -> str:
-    # 去掉常见标点
-    cleaned = re.sub(r'[*=，。！？“”‘’（）【】、；：]', '', text)
-    # 哈希前6位
-    return hashlib.md5(cleaned.encode('utf-8')).hexdigest()[:6]
+def pcm_to_wav(pcm: bytes, rate: int = STREAM_RATE, channels: int = STREAM_CHANNELS) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(pcm)
+    return buf.getvalue()
 
 
-def speech_synthesize(text: str, out_dir: Path = Path("/home/hugd/privateprojects/personalvoicehelper/tmp/speechsynth")) -> Path:
+def speech_synthesize(text: str, out_dir: Optional[Path] = None) -> Path:
     """
-    调用 DashScope TTS，同步生成或复用 MP3 文件。
+    调用 DashScope TTS，同步生成或复用 MP3 文件（见 tts_cache.TTSCache）。
     返回生成的 mp3 路径。
     """
-    out_dir.mkdir(parents=True, exist_ok=True)
-    name = generate_hash_file_name(text)
-    path = out_dir / f"{name}.mp3"
-    if path.exists():
-        print(f"[TTS] 文件已存在: {path.name}")
-    else:
-        print(f"[TTS] 生成新文件: {path.name}")
+    cache = get_cache(out_dir or DEFAULT_DIR)
+
+    def _synthesize() -> bytes:
+        print(f"[TTS] 生成新文件: {text[:20]!r}")
         # dashscope.api_key = "your_api_key"  # 如需手动设置
-        synth = SpeechSynthesizer(model="cosyvoice-v1", voice="longxiaochun")
-        audio = synth.call(text)
-        with open(path, "wb") as f:
-            f.write(audio)
-    return path
+        synth = SpeechSynthesizer(model=TTS_MODEL, voice=TTS_VOICE)
+        return synth.call(text)
+
+    return cache.get_or_create(text, TTS_MODEL, TTS_VOICE, TTS_FORMAT, _synthesize)
+
+
+class StreamingSynthesis(ResultCallback):
+    """
+    流式 TTS：PCM 分片一到就能播放，不用等整句合成完、也不用再解码 mp3。
+      - run() 发起合成并阻塞到结束（放 network 线程池），结束后把收齐的整句以 wav 存入
+        TTS 缓存（tee），下次同一句直接命中
+      - attach(source) 之后分片由合成回调直接写进输出的 PushSource，不另占线程搬运；
+        可以在合成开始之后才调用，已到达的分片会先补上
+      - cancel() 打断合成，之后的分片直接丢弃，不入缓存
+    """
+    def __init__(self, text: str, out_dir: Optional[Path] = None):
+        self.text = text
+        self.out_dir = out_dir
+        self._chunks: List[bytes] = []
+        self._lock = threading.Lock()
+        self._done = False
+        self._cancelled = False
+        self._synth: Optional[SpeechSynthesizer] = None
+        self._sink = None
+        self._on_first: Optional[Callable[[], None]] = None
+        self.error: Optional[str] = None
+
+    # ------------ ResultCallback ------------
+    def on_data(self, data: bytes):
+        with self._lock:
+            if self._cancelled:
+                return
+            self._chunks.append(data)
+            if self._sink is not None:
+                self._write(data)
+
+    def on_error(self, message):
+        print(f"[TTS] 流式合成出错: {message}")
+        self.error = str(message)
+        self._finish()
+
+    def on_close(self):
+        self._finish()
+
+    def _finish(self):
+        with self._lock:
+            if self._done:
+                return
+            self._done = True
+            if self._sink is not None:
+                self._end_sink()
+
+    # 以下两个方法调用方持有 self._lock
+    def _write(self, data: bytes):
+        if self._on_first is not None:
+            self._on_first()
+            self._on_first = None
+        self._sink.write(data)
+
+    def _end_sink(self):
+        # 一个分片都没收到（出错/取消）时直接关掉，播放句柄随即结束
+        if self._chunks and not self._cancelled:
+            self._sink.end()
+        else:
+            self._sink.close()
+
+    # ------------ 对外接口 ------------
+    def run(self) -> Optional[Path]:
+        """阻塞到合成结束；成功时返回缓存里的 wav 路径，出错/取消时返回 None"""
+        print(f"[TTS] 流式合成: {self.text[:20]!r}")
+        try:
+            self._synth = SpeechSynthesizer(
+                model=TTS_MODEL,
+                voice=TTS_VOICE,
+                format=AudioFormat.PCM_22050HZ_MONO_16BIT,
+                callback=self,
+            )
+            if not self._cancelled:
+                self._synth.streaming_call(self.text)
+                self._synth.streaming_complete()
+        except Exception as e:
+            self.error = self.error or str(e)
+        finally:
+            self._finish()
+        with self._lock:
+            if self.error or self._cancelled or not self._chunks:
+                return None
+            pcm = b"".join(self._chunks)
+        cache = get_cache(self.out_dir or DEFAULT_DIR)
+        return cache.put(self.text, TTS_MODEL, TTS_VOICE, STREAM_FORMAT, pcm_to_wav(pcm))
+
+    def attach(self, source, on_first: Optional[Callable[[], None]] = None):
+        """
+        之后的分片直接写进 source（PushSource），已到达的先补写；合成结束时 source.end()，
+        什么都没收到则 source.close()。on_first 在第一块分片写入时调用一次（回调线程或调用方线程）。
+        """
+        with self._lock:
+            self._sink = source
+            self._on_first = on_first
+            for chunk in self._chunks:
+                self._write(chunk)
+            if self._done:
+                self._end_sink()
+
+    @property
+    def received(self) -> bool:
+        return bool(self._chunks)
+
+    def cancel(self):
+        self._cancelled = True
+        # 先关输出再拿锁：回调线程可能正持锁阻塞在写入上，关掉后写入立即返回
+        sink = self._sink
+        if sink is not None:
+            sink.close()
+        with self._lock:
+            self._done = True
+        if self._synth is not None:
+            try:
+                self._synth.streaming_cancel()
+            except Exception:
+                pass
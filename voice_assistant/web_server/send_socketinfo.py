@@ -66,6 +66,16 @@ class WebSocketClient:
         except Exception as e:
             print(f"发送消息时发生错误: {e}")
 
+    def send_metrics(self, metrics: dict):
+        """
+        推送调度器指标（AudioScheduler.metrics_snapshot()），服务端缓存并转发给 WebUI。
+        频率由调度器控制，这里不打印，避免刷屏。
+        """
+        try:
+            self.sio.emit('scheduler_metrics', metrics)
+        except Exception as e:
+            print(f"发送指标时发生错误: {e}")
+
     def wait(self):
         """保持连接，等待事件"""
         self.sio.wait()
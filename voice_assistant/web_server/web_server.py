@@ -2,7 +2,7 @@ import eventlet
 
 eventlet.monkey_patch()
 
-from flask import Flask, render_template, request
+from flask import Flask, render_template, request, jsonify
 from flask_socketio import SocketIO, emit
 import base64
 from datetime import datetime
@@ -14,6 +14,8 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 
 clients = {}
+# 语音助手最近一次上报的调度器指标
+latest_metrics = {}
 
 app = Flask(__name__)
 socketio = SocketIO(app,
@@ -25,6 +27,11 @@ socketio = SocketIO(app,
 def index():
     return render_template('index.html')
 
+@app.route('/metrics')
+def metrics():
+    """调度器指标（排队/prepare/play/端到端耗时、抢占次数、队列深度）"""
+    return jsonify(latest_metrics)
+
 @socketio.on('connect')
 def handle_connect():
     sid = request.sid
@@ -93,6 +100,13 @@ def handle_status_update(data):
     # 广播给所有客户端
     socketio.emit('update_status', data)
 
+@socketio.on('scheduler_metrics')
+def handle_scheduler_metrics(data):
+    # 缓存给 /metrics，并转发给所有页面
+    latest_metrics.clear()
+    latest_metrics.update(data)
+    socketio.emit('update_metrics', data)
+
 # 放在所有 @socketio.on(...) 之后
 @socketio.on('*')
 def catch_all(event, data):